@@ -0,0 +1,102 @@
+"""Decode cost of the hot API responses: the old `ClientResponse.json()` path vs `bot.utils.fast_json`.
+
+    python -m benchmarks.bench_json [--number 2000]
+
+The old path decodes the body to str and then runs `json.loads`, the fast path hands the
+raw bytes to orjson/msgspec when one is installed. The second table compares field
+access on the raw dicts with the slotted models from `bot.core.models`.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# bot.utils.fast_json loads the settings, which need these to be set
+os.environ.setdefault('API_ID', '1')
+os.environ.setdefault('API_HASH', 'benchmark')
+
+from bot.core.models import Balance, Task, RankData  # noqa: E402
+from bot.utils.fast_json import JSON_BACKEND, decode  # noqa: E402
+
+
+def make_task(task_id: int, **fields) -> dict:
+    task = {
+        'taskId': task_id, 'name': f'Task {task_id}', 'type': 'youtube' if task_id % 7 == 0 else 'follow',
+        'status': task_id % 4, 'enable': True, 'invisible': False, 'waitSecond': 30, 'score': 500,
+        'startTime': '2024-10-01 00:00:00', 'endTime': '2030-10-01 00:00:00', 'icon': 'https://example.com/icon.png',
+        'description': 'Lorem ipsum dolor sit amet ' * 4, 'handleFunc': 'jump', 'url': 'https://t.me/tomarket_ai',
+    }
+    task.update(fields)
+    return task
+
+
+PAYLOADS = {
+    '/user/balance': {'status': 0, 'message': '', 'data': {
+        'available_balance': '123456.78', 'play_passes': 12, 'timestamp': 1730000000,
+        'farming': {'game_id': '53b22103-c7ff-413d-bc63-20f6fb806a07', 'round_id': 'abc', 'user_id': 1,
+                    'start_at': 1729990000, 'end_at': 1730018800, 'last_claim': 1729990000, 'points': '0.1'},
+        'daily': {'round_start_at': 1729990000, 'last_check_ts': 1729990000, 'last_check_ymd': 20241027,
+                  'next_check_ts': 1730076400, 'check_counter': 5, 'today_points': 100, 'today_game': 1},
+    }},
+    '/tasks/list': {'status': 0, 'message': '', 'data': {
+        'standard': [make_task(i) for i in range(150)],
+        'expire': [make_task(i) for i in range(150, 200)],
+        'groups': {f'group_{g}': [make_task(1000 + g * 10 + i) for i in range(10)] for g in range(5)},
+    }},
+    '/rank/data': {'status': 0, 'message': '', 'data': {
+        'isCreated': True, 'unusedStars': '42.0', 'usedStars': 10,
+        'currentRank': {'name': 'Silver', 'level': 3, 'range': [100, 500], 'image': 'https://example.com/r.png'},
+    }},
+}
+
+
+def old_decode(body: bytes):
+    return json.loads(body.decode('utf-8'))
+
+
+def bench(stmt, number: int) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=2000)
+    number = parser.parse_args().number
+
+    print(f"Fast JSON backend: {JSON_BACKEND}\n")
+    print(f"{'endpoint':<16}{'bytes':>9}{'json() us':>12}{'fast us':>10}{'speedup':>9}")
+    for endpoint, payload in PAYLOADS.items():
+        body = json.dumps(payload).encode()
+        old = bench(lambda: old_decode(body), number)
+        new = bench(lambda: decode(body), number)
+        print(f"{endpoint:<16}{len(body):>9}{old:>12.2f}{new:>10.2f}{old / new:>8.1f}x")
+
+    balance = PAYLOADS['/user/balance']['data']
+    rank = PAYLOADS['/rank/data']['data']
+    tasks = PAYLOADS['/tasks/list']['data']['standard']
+    balance_model = Balance.from_data(balance)
+    task_models = [Task.from_data(task) for task in tasks]
+
+    def dict_access():
+        farming = balance.get('farming')
+        return (balance.get('available_balance', 0), balance.get('play_passes', 0),
+                farming['end_at'] if 'farming' in balance else None,
+                sum(task.get('waitSecond', 0) for task in tasks if task.get('enable') and not task.get('invisible', False)))
+
+    def model_access():
+        return (balance_model.available_balance, balance_model.play_passes, balance_model.farm_end_at,
+                sum(task.wait_second for task in task_models if task.enable and not task.invisible))
+
+    print(f"\n{'field access':<28}{'us':>8}")
+    print(f"{'dict .get() chains':<28}{bench(dict_access, number):>8.2f}")
+    print(f"{'slotted models':<28}{bench(model_access, number):>8.2f}")
+    print(f"{'build Balance + RankData':<28}{bench(lambda: (Balance.from_data(balance), RankData.from_data(rank)), number):>8.2f}")
+    print(f"{'build 150 Task models':<28}{bench(lambda: [Task.from_data(task) for task in tasks], number // 10):>8.2f}"
+          "  (once per catalog version, shared by all accounts)")
+
+
+if __name__ == '__main__':
+    main()
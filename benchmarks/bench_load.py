@@ -0,0 +1,180 @@
+"""End-to-end load benchmark: N synthetic accounts against the local mock API.
+
+    python -m benchmarks.bench_load --accounts 500 --cycles 2 --latency 50
+
+The mock (`benchmarks.mock_server`) runs in a child process so its CPU isn't counted.
+Accounts are `StubTapper`s (Telegram web data is generated, no pyrogram) driven by the
+real `Scheduler`, session pool, limiter, caches and state store. Each account runs
+`--cycles` full cycles back to back. Rate limits are lifted unless --rate-limit is set.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter, process_time, time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import mock_server  # noqa: E402
+
+
+def rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        # Peak rather than current RSS, still fine for a before/after delta
+        scale = 2 ** 20 if sys.platform == 'darwin' else 2 ** 10
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def configure_env(args: argparse.Namespace) -> None:
+    # Settings are read once at import, so this has to happen before anything from bot is imported
+    unlimited = str(args.rate_limit or 1e9)
+    os.environ.update(
+        API_BASE_URL=f"http://127.0.0.1:{args.port}{mock_server.BASE_PATH}",
+        GLOBAL_RATE_LIMIT=unlimited,
+        ENDPOINT_RATE_LIMIT=unlimited,
+        MAX_ACTIVE_SESSIONS=str(args.concurrency),
+        USE_RANDOM_DELAY_IN_RUN='false',
+        AUTO_ADD_WALLET='false',
+        LOOP_LAG_THRESHOLD='0',
+    )
+    os.environ.setdefault('API_ID', '1')
+    os.environ.setdefault('API_HASH', 'benchmark')
+
+
+async def wait_for_mock(port: int, timeout: float = 10) -> None:
+    import aiohttp
+
+    deadline = time() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(f"http://127.0.0.1:{port}/_stats") as response:
+                    await response.read()
+                    return
+            except aiohttp.ClientError:
+                if time() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+
+async def mock_stats(port: int) -> dict:
+    import aiohttp
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"http://127.0.0.1:{port}/_stats") as response:
+            return await response.json()
+
+
+async def run(args: argparse.Namespace, workdir: str) -> None:
+    from loguru import logger
+
+    import bot.utils  # noqa: F401 (loads bot.utils before bot.core, as main.py does)
+    from bot.config import settings
+    from bot.core.auth_cache import auth_cache
+    from bot.core.http_pool import session_pool
+    from bot.core.scheduler import Scheduler
+    from bot.core.state_store import state_store
+    from benchmarks.stubs import StubClient, StubTapper
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level, format="{time:HH:mm:ss} | {level: <8} | {message}")
+    auth_cache.path = os.path.join(workdir, 'auth_cache.json')
+    state_store.path = os.path.join(workdir, 'state.db')
+
+    await wait_for_mock(args.port)
+
+    rss_start = rss_mb()
+    latencies = []
+    tappers = [StubTapper(StubClient(f"bench_{index}"), latencies=latencies) for index in range(args.accounts)]
+    rss_built = rss_mb()
+
+    scheduler = Scheduler(workers=settings.MAX_ACTIVE_SESSIONS)
+    cycles = []
+
+    def cycle_job(tapper: StubTapper):
+        remaining = args.cycles
+
+        async def job():
+            nonlocal remaining
+            start = perf_counter()
+            await tapper.run_cycle()
+            cycles.append(perf_counter() - start)
+            remaining -= 1
+            if remaining <= 0:
+                return None
+            # Make the next cycle a full one again
+            tapper.job_due.clear()
+            tapper.end_farming_dt = 0
+            tapper.next_combo_check = 0
+            tapper.response_cache.clear()
+            return time()
+
+        return job
+
+    for tapper in tappers:
+        scheduler.add(tapper.session_name, cycle_job(tapper))
+
+    session_pool.start()
+    cpu_start, wall_start = process_time(), perf_counter()
+    runner = asyncio.create_task(scheduler.run())
+    while len(scheduler):
+        await asyncio.sleep(0.05)
+    wall, cpu = perf_counter() - wall_start, process_time() - cpu_start
+    rss_end = rss_mb()
+
+    runner.cancel()
+    await session_pool.close()
+    state_store.close()
+    stats = await mock_stats(args.port)
+
+    requests = len(latencies)
+    print(f"\naccounts {args.accounts} x {args.cycles} cycles, {settings.MAX_ACTIVE_SESSIONS} concurrent, "
+          f"mock latency {args.latency}ms, error rate {args.error_rate}")
+    print(f"wall             {wall:.2f}s")
+    print(f"requests         {requests} ({stats['errors']} injected errors)")
+    print(f"throughput       {requests / wall:.1f} req/s, {len(cycles) / wall:.1f} cycles/s")
+    print(f"latency          p50 {percentile(latencies, 50) * 1000:.1f}ms  p99 {percentile(latencies, 99) * 1000:.1f}ms")
+    print(f"cycle            p50 {percentile(cycles, 50):.2f}s  p99 {percentile(cycles, 99):.2f}s")
+    print(f"memory           {(rss_end - rss_start) * 1024 / args.accounts:.1f} KiB/account "
+          f"({(rss_built - rss_start) * 1024 / args.accounts:.1f} KiB for the Tapper objects), RSS {rss_end:.1f} MiB")
+    print(f"cpu              {cpu:.2f}s ({cpu / wall * 100:.0f}% of a core), {cpu / max(1, requests) * 1000:.2f}ms/request")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    mock_server.add_arguments(parser)
+    parser.add_argument('--accounts', type=int, default=100)
+    parser.add_argument('--cycles', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=100, help="Scheduler workers (MAX_ACTIVE_SESSIONS)")
+    parser.add_argument('--rate-limit', type=float, default=0, help="Requests per second, 0 lifts the limiter")
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+    configure_env(args)
+
+    server = multiprocessing.Process(target=mock_server.run, args=(mock_server.config_from_args(args),),
+                                     kwargs={'port': args.port}, daemon=True)
+    server.start()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            asyncio.run(run(args, workdir))
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == '__main__':
+    main()
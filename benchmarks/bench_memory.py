@@ -0,0 +1,96 @@
+"""Resident memory of idle sessions: what the bot holds per session while it isn't using Telegram.
+
+    python -m benchmarks.bench_memory --sessions 100 1000
+
+Every configuration runs in a fresh interpreter that builds N sessions (client plus
+`Tapper`, as `run_tasks` does) in a scratch directory and reports the RSS growth:
+
+    eager     a full pyrogram Client per session with default workers and plugins (the old setup)
+    minimal   the current client configuration, built for every session (all sessions logged in recently)
+    released  the current setup after every session used Telegram and was evicted as idle
+    lazy      the current setup, sessions that don't need Telegram never build a client
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_load import rss_mb  # noqa: E402
+
+MODES = ('eager', 'minimal', 'released', 'lazy')
+
+
+async def build(mode: str, sessions: int) -> dict:
+    import bot.utils  # noqa: F401 (loads bot.utils before bot.core, as main.py does)
+    from bot.config import settings
+    from bot.core.tapper import Tapper
+    from bot.utils.launcher import build_tg_clients
+
+    session_names = [f"bench_{index}" for index in range(sessions)]
+    if mode != 'lazy':
+        # What the pyrogram import costs is not per session, keep it out of the delta
+        from pyrogram import Client
+    gc.collect()
+    rss_start = rss_mb()
+
+    if mode == 'eager':
+        tg_clients = [Client(name=session_name, api_id=settings.API_ID, api_hash=settings.API_HASH,
+                             workdir="sessions/", plugins=dict(root="bot/plugins"))
+                      for session_name in session_names]
+    else:
+        tg_clients = build_tg_clients(session_names)
+        if mode in ('minimal', 'released'):
+            for tg_client in tg_clients:
+                tg_client.build()
+        if mode == 'released':
+            for tg_client in tg_clients:
+                tg_client.release()
+    tappers = [Tapper(tg_client=tg_client, proxy=None) for tg_client in tg_clients]
+
+    gc.collect()
+    rss_end = rss_mb()
+    return {'mode': mode, 'sessions': len(tappers), 'rss_mb': round(rss_end, 1),
+            'kib_per_session': round((rss_end - rss_start) * 1024 / sessions, 1),
+            'pyrogram_loaded': 'pyrogram' in sys.modules}
+
+
+def measure(mode: str, sessions: int) -> dict:
+    env = dict(os.environ, API_ID='1', API_HASH='benchmark')
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, 'sessions'))
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_memory', '--child', mode, str(sessions)],
+                                cwd=workdir, env={**env, 'PYTHONPATH': str(Path(__file__).resolve().parent.parent)},
+                                capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'SESSIONS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, sessions = args.child
+        print(json.dumps(asyncio.run(build(mode, int(sessions)))))
+        return
+
+    print(f"{'sessions':>8}  {'mode':<8}  {'KiB/session':>11}  {'total':>10}  {'RSS':>9}  pyrogram")
+    for sessions in args.sessions:
+        for mode in args.modes:
+            result = measure(mode, sessions)
+            total = result['kib_per_session'] * sessions / 1024
+            print(f"{sessions:>8}  {mode:<8}  {result['kib_per_session']:>11.1f}  {total:>8.1f}MB  "
+                  f"{result['rss_mb']:>7.1f}MB  {'loaded' if result['pyrogram_loaded'] else 'not loaded'}")
+
+
+if __name__ == '__main__':
+    main()
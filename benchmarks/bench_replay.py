@@ -0,0 +1,159 @@
+"""Replays a traffic recording through the real `Tapper` and reports cost per cycle.
+
+    RECORD_TRAFFIC=sessions/traffic.jsonl python3 main.py -a 1     # capture
+    python -m benchmarks.bench_replay sessions/traffic.jsonl --cycles 3 --output before.json
+
+Every session in the recording runs `--cycles` full cycles back to back, its API
+responses and Telegram logins come from the recording (see `bot.core.traffic`), so
+no network is needed. Waits inside a cycle (games, task timers, backoff) are
+skipped and random choices are seeded, so two runs of the same tree make the same
+requests. Compare the `--output` files of two versions to see what changed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+from time import perf_counter, process_time, time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_load import percentile  # noqa: E402
+
+
+def configure_env(args: argparse.Namespace) -> None:
+    # Settings are read once at import, so this has to happen before anything from bot is imported
+    os.environ.update(
+        REPLAY_TRAFFIC=args.recording,
+        RECORD_TRAFFIC='',
+        GLOBAL_RATE_LIMIT='1e9',
+        ENDPOINT_RATE_LIMIT='1e9',
+        USE_RANDOM_DELAY_IN_RUN='false',
+        LOOP_LAG_THRESHOLD='0',
+    )
+    os.environ.setdefault('API_ID', '1')
+    os.environ.setdefault('API_HASH', 'replay')
+
+
+def recorded_summary(path: str) -> tuple[Counter, list[float]]:
+    requests, latencies = Counter(), []
+    for recording in [path] + sorted(Path(path).parent.glob(f"{Path(path).stem}.*{Path(path).suffix}")):
+        if not os.path.exists(recording):
+            continue
+        with open(recording, encoding='utf-8') as lines:
+            for line in lines:
+                entry = json.loads(line)
+                if entry['type'] == 'http':
+                    requests[entry['endpoint']] += 1
+                    latencies.append(entry['elapsed'])
+    return requests, latencies
+
+
+async def run(args: argparse.Namespace, workdir: str) -> dict:
+    from loguru import logger
+
+    import bot.utils  # noqa: F401 (loads bot.utils before bot.core, as main.py does)
+    from bot.core.auth_cache import auth_cache
+    from bot.core.http_pool import session_pool
+    from bot.core.state_store import state_store
+    from bot.core.tapper import Tapper
+    from bot.core.tg_pool import LazyClient
+    from bot.core.traffic import traffic
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level, format="{time:HH:mm:ss} | {level: <8} | {message}")
+    auth_cache.path = os.path.join(workdir, 'auth_cache.json')
+    state_store.path = os.path.join(workdir, 'state.db')
+
+    requests = Counter()
+    replay_exchange = traffic.replay_exchange
+
+    def counted(session_name, method, endpoint):
+        requests[endpoint] += 1
+        return replay_exchange(session_name, method, endpoint)
+
+    traffic.replay_exchange = counted
+
+    sleep = asyncio.sleep
+
+    async def skip_wait(delay, result=None):
+        return await sleep(0, result)
+
+    asyncio.sleep = skip_wait
+    random.seed(args.seed)
+
+    tappers = [Tapper(tg_client=LazyClient(session_name), proxy=None) for session_name in traffic.sessions]
+    limit = asyncio.Semaphore(args.concurrency)
+    cycles = []
+
+    async def run_cycles(tapper: Tapper) -> None:
+        for _ in range(args.cycles):
+            async with limit:
+                start = perf_counter()
+                await tapper.run_cycle()
+                cycles.append(perf_counter() - start)
+            # Make the next cycle a full one again
+            tapper.job_due.clear()
+            tapper.end_farming_dt = 0
+            tapper.next_combo_check = 0
+            tapper.response_cache.clear()
+
+    cpu_start, wall_start = process_time(), perf_counter()
+    try:
+        await asyncio.gather(*(run_cycles(tapper) for tapper in tappers))
+    finally:
+        asyncio.sleep = sleep
+    wall, cpu = perf_counter() - wall_start, process_time() - cpu_start
+    await session_pool.close()
+    state_store.close()
+
+    return {
+        'sessions': len(tappers),
+        'cycles': len(cycles),
+        'wall': round(wall, 3),
+        'cpu': round(cpu, 3),
+        'cycle_p50': round(percentile(cycles, 50), 5),
+        'cycle_p99': round(percentile(cycles, 99), 5),
+        'requests': sum(requests.values()),
+        'requests_by_endpoint': dict(sorted(requests.items())),
+        'at': int(time()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('recording', help="JSON lines file written with RECORD_TRAFFIC")
+    parser.add_argument('--cycles', type=int, default=1, help="Full cycles per session")
+    parser.add_argument('--concurrency', type=int, default=100, help="Sessions running a cycle at once")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Also write the results as JSON to this file")
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+    configure_env(args)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        result = asyncio.run(run(args, workdir))
+
+    recorded_requests, recorded_latencies = recorded_summary(args.recording)
+    print(f"\n{result['sessions']} sessions x {args.cycles} cycles from {args.recording}")
+    print(f"recorded         {sum(recorded_requests.values())} requests, "
+          f"latency p50 {percentile(recorded_latencies, 50) * 1000:.1f}ms  p99 {percentile(recorded_latencies, 99) * 1000:.1f}ms")
+    print(f"replayed         {result['requests']} requests in {result['wall']:.2f}s, "
+          f"{result['requests'] / max(1, result['cycles']):.1f} per cycle")
+    print(f"cycle            p50 {result['cycle_p50'] * 1000:.2f}ms  p99 {result['cycle_p99'] * 1000:.2f}ms")
+    print(f"cpu              {result['cpu']:.2f}s, {result['cpu'] / max(1, result['cycles']) * 1000:.2f}ms/cycle, "
+          f"{result['cpu'] / max(1, result['requests']) * 1000:.3f}ms/request")
+    for endpoint, count in result['requests_by_endpoint'].items():
+        print(f"  {endpoint:<24} {count:>6} (recorded {recorded_requests.get(endpoint, 0)})")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(result, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
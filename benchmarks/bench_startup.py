@@ -0,0 +1,114 @@
+"""Startup benchmark: time from launching `main.py -a 1` to its first API request.
+
+    python -m benchmarks.bench_startup --sessions 1 100 1000 --repeat 3
+
+Each run starts the real bot in a fresh interpreter, in a scratch directory with N
+empty session files and a cached login per session, against the local mock API, so
+the first request needs no Telegram connection. The startup API change and version
+checks still go to their real hosts, bounded by --check-timeout. Time to first
+request covers interpreter start, imports, those checks and building every account.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import sleep, time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import mock_server  # noqa: E402
+from benchmarks.bench_load import wait_for_mock  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def prepare_workdir(workdir: str, sessions: int) -> None:
+    os.makedirs(os.path.join(workdir, 'sessions'))
+    cache = {}
+    expires_at = time() + 86400
+    for index in range(sessions):
+        session_name = f"bench_{index}"
+        Path(workdir, 'sessions', f"{session_name}.session").touch()
+        cache[session_name] = {
+            'ref_id': '0001b3Lf',
+            'init_data': f"user=%7B%22id%22%3A{index}%7D&auth_date={int(time())}&hash={session_name}",
+            'init_data_expires_at': expires_at,
+            'access_token': f"bench-{index}",
+            'expires_at': expires_at,
+        }
+    with open(os.path.join(workdir, 'sessions', 'auth_cache.json'), 'w') as cache_file:
+        json.dump(cache, cache_file)
+
+
+def mock_request(port: int, method: str = 'GET') -> dict:
+    import urllib.request
+
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/_stats", method=method)
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.load(response)
+
+
+def time_to_first_request(args: argparse.Namespace, sessions: int) -> float | None:
+    mock_request(args.port, 'DELETE')
+    env = dict(
+        os.environ,
+        API_ID='1',
+        API_HASH='benchmark',
+        API_BASE_URL=f"http://127.0.0.1:{args.port}{mock_server.BASE_PATH}",
+        USE_RANDOM_DELAY_IN_RUN='false',
+        AUTO_ADD_WALLET='false',
+        STARTUP_CHECK_TIMEOUT=str(args.check_timeout),
+    )
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_workdir(workdir, sessions)
+        start = time()
+        bot = subprocess.Popen([sys.executable, str(ROOT / 'main.py'), '-a', '1'], cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+        try:
+            deadline = start + args.timeout
+            while time() < deadline and bot.poll() is None:
+                first_request_at = mock_request(args.port)['first_request_at']
+                if first_request_at is not None:
+                    return first_request_at - start
+                sleep(0.005)
+            return None
+        finally:
+            bot.terminate()
+            bot.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    mock_server.add_arguments(parser)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--check-timeout', type=float, default=2, help="STARTUP_CHECK_TIMEOUT for the bot")
+    parser.add_argument('--timeout', type=float, default=60, help="Give up on a run after this many seconds")
+    parser.add_argument('--verbose', action='store_true', help="Show the bot's log output")
+    args = parser.parse_args()
+
+    server = multiprocessing.Process(target=mock_server.run, args=(mock_server.config_from_args(args),),
+                                     kwargs={'port': args.port}, daemon=True)
+    server.start()
+    try:
+        asyncio.run(wait_for_mock(args.port))
+        print(f"{'sessions':>8}  {'median':>8}  {'min':>8}  {'max':>8}")
+        for sessions in args.sessions:
+            runs = [time_to_first_request(args, sessions) for _ in range(args.repeat)]
+            if None in runs:
+                print(f"{sessions:>8}  no request within {args.timeout}s")
+                continue
+            print(f"{sessions:>8}  {statistics.median(runs):>7.3f}s  {min(runs):>7.3f}s  {max(runs):>7.3f}s")
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == '__main__':
+    main()
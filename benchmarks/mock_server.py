@@ -0,0 +1,185 @@
+"""Local stand-in for the Tomarket API, for benchmarks and offline runs.
+
+    python -m benchmarks.mock_server --port 18765 --latency 50 --error-rate 0.01
+
+Point the bot at it with API_BASE_URL=http://127.0.0.1:18765/tomarket-game/v1.
+Every account gets a fresh farm to claim, a daily reward and an already claimed
+combo, so a cycle exercises farm, daily, combo, tasks and rank without any sleeps
+unless --play-passes or --open-tasks are set.
+"""
+import argparse
+import asyncio
+import json
+from dataclasses import dataclass
+from random import gauss, random
+from time import time
+
+from aiohttp import web
+
+BASE_PATH = '/tomarket-game/v1'
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.05
+    jitter: float = 0.01
+    error_rate: float = 0.0
+    tasks: int = 200
+    open_tasks: int = 0
+    play_passes: int = 0
+    tickets: int = 0
+    padding: int = 0
+
+
+def build_tasks(config: MockConfig) -> dict:
+    def task(task_id: int, status: int) -> dict:
+        return {
+            'taskId': task_id, 'name': f'Task {task_id}', 'type': 'follow', 'status': status,
+            'enable': True, 'invisible': False, 'waitSecond': 0, 'score': 100,
+            'icon': 'https://example.com/icon.png', 'url': 'https://t.me/tomarket_ai',
+            'description': 'Follow the channel and stay tuned for updates',
+        }
+
+    # Done tasks only add payload, open ones go through start/check/claim
+    standard = [task(task_id, 0 if task_id < config.open_tasks else 3) for task_id in range(config.tasks)]
+    return {'status': 0, 'message': '', 'data': {'standard': standard}}
+
+
+class MockTomarket:
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.requests = 0
+        self.errors = 0
+        self.first_request_at = None
+        self._tasks_payload = build_tasks(config)
+        self._padding = 'x' * config.padding
+
+    def payload(self, endpoint: str, body: dict) -> dict:
+        now = int(time())
+        config = self.config
+        if endpoint == '/user/login':
+            return {'status': 0, 'data': {'access_token': f"mock-{(body.get('init_data') or '')[-16:]}"}}
+        if endpoint == '/user/balance':
+            return {'status': 0, 'data': {'available_balance': '1000.5', 'play_passes': config.play_passes,
+                                          'timestamp': now, 'farming': {'start_at': now - 10800, 'end_at': now - 1}}}
+        if endpoint == '/farm/claim':
+            return {'status': 0, 'data': {'claim_this_time': '7.5', 'end_at': now - 1}}
+        if endpoint == '/farm/start':
+            return {'status': 0, 'data': {'start_at': now, 'end_at': now + 10800}}
+        if endpoint == '/daily/claim':
+            return {'status': 0, 'data': {'today_game': 1, 'today_points': 100}}
+        if endpoint == '/game/play':
+            return {'status': 0, 'data': {'round_id': 'mock'}}
+        if endpoint == '/game/claim':
+            return {'status': 0, 'data': {'points': body.get('points', 0)}}
+        if endpoint == '/tasks/list':
+            return self._tasks_payload
+        if endpoint == '/tasks/start':
+            return {'status': 0, 'data': {'status': 1}}
+        if endpoint in ('/tasks/check', '/tasks/claim'):
+            return {'status': 0, 'data': 'ok'}
+        if endpoint == '/tasks/puzzle':
+            return {'status': 0, 'data': [{'taskId': 1, 'status': 1, 'endTime': '2099-01-01 00:00:00'}]}
+        if endpoint == '/user/tickets':
+            return {'status': 0, 'data': {'ticket_spin_1': config.tickets}}
+        if endpoint == '/spin/raffle':
+            return {'status': 0, 'data': {'results': [{'amount': 10, 'type': 'TOMA'}]}}
+        if endpoint == '/rank/evaluate':
+            return {'status': 0, 'data': {'stars': 10}}
+        if endpoint == '/rank/create':
+            return {'status': 0, 'data': {'isCreated': True}}
+        if endpoint == '/rank/data':
+            return {'status': 0, 'data': {'isCreated': True, 'unusedStars': 0, 'currentRank': {'name': 'Bronze'}}}
+        if endpoint == '/rank/upgrade':
+            return {'status': 0, 'data': {}}
+        if endpoint == '/tasks/walletTask':
+            return {'status': 0, 'data': {'walletAddress': ''}}
+        return {'status': 0, 'data': {}}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.first_request_at is None:
+            self.first_request_at = time()
+        self.requests += 1
+        config = self.config
+        if config.latency > 0:
+            await asyncio.sleep(max(0.0, gauss(config.latency, config.jitter)))
+        if config.error_rate and random() < config.error_rate:
+            self.errors += 1
+            return web.Response(status=503, text='Service Unavailable')
+
+        endpoint = request.path[len(BASE_PATH):]
+        try:
+            body = await request.json() if request.can_read_body else {}
+        except (json.JSONDecodeError, ConnectionResetError):
+            # Garbage, or a client that went away mid-request (benchmarks kill the bot)
+            body = {}
+        payload = self.payload(endpoint, body if isinstance(body, dict) else {})
+        if self._padding:
+            payload = {**payload, 'padding': self._padding}
+        return web.json_response(payload)
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({'requests': self.requests, 'errors': self.errors,
+                                  'first_request_at': self.first_request_at})
+
+    async def handle_reset(self, request: web.Request) -> web.Response:
+        self.requests = self.errors = 0
+        self.first_request_at = None
+        return web.json_response({})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/_stats', self.handle_stats)
+        app.router.add_delete('/_stats', self.handle_reset)
+        app.router.add_route('*', BASE_PATH + '/{endpoint:.*}', self.handle)
+        return app
+
+
+async def serve(config: MockConfig, host: str = '127.0.0.1', port: int = 18765) -> None:
+    runner = web.AppRunner(MockTomarket(config).app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port, backlog=4096).start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def run(config: MockConfig, host: str = '127.0.0.1', port: int = 18765) -> None:
+    try:
+        asyncio.run(serve(config, host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--port', type=int, default=18765)
+    parser.add_argument('--latency', type=float, default=50, help="Mean response latency in ms")
+    parser.add_argument('--jitter', type=float, default=10, help="Latency standard deviation in ms")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    parser.add_argument('--tasks', type=int, default=200, help="Entries in /tasks/list (payload size)")
+    parser.add_argument('--open-tasks', type=int, default=0, help="Tasks each account has to complete")
+    parser.add_argument('--play-passes', type=int, default=0, help="Game passes per balance (each game waits 30s)")
+    parser.add_argument('--tickets', type=int, default=0, help="Raffle tickets per account")
+    parser.add_argument('--padding', type=int, default=0, help="Extra bytes added to every response")
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        error_rate=args.error_rate,
+        tasks=args.tasks,
+        open_tasks=args.open_tasks,
+        play_passes=args.play_passes,
+        tickets=args.tickets,
+        padding=args.padding
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    args = parser.parse_args()
+    print(f"Mock Tomarket API on http://127.0.0.1:{args.port}{BASE_PATH}")
+    run(config_from_args(args), port=args.port)
@@ -0,0 +1,42 @@
+"""Telegram stand-ins so benchmarks drive `Tapper` without pyrogram or real sessions."""
+from time import time, perf_counter
+from urllib.parse import quote
+
+from bot.core.tapper import Tapper
+from bot.core.traffic import recorded_web_data
+
+
+class StubClient:
+    """Just enough of `pyrogram.Client` for `Tapper`: a name and no connection."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.is_connected = False
+
+
+class StubTapper(Tapper):
+    """A `Tapper` whose web app data comes from a generator instead of Telegram.
+
+    `latencies` collects the duration of every API request it sends (rate limiter wait included).
+    """
+
+    def __init__(self, tg_client: StubClient, proxy: str | None = None, latencies: list | None = None):
+        super().__init__(tg_client=tg_client, proxy=proxy)
+        self.latencies = latencies if latencies is not None else []
+
+    @recorded_web_data
+    async def get_tg_web_data(self) -> tuple[str, str]:
+        user = quote(f'{{"id":{abs(hash(self.session_name)) % 10 ** 9},"first_name":"{self.session_name}"}}')
+        init_data = (f"user={user}&chat_instance=1&chat_type=sender&start_param=0001b3Lf"
+                     f"&auth_date={int(time())}&hash={self.session_name}")
+        return '0001b3Lf', init_data
+
+    async def name_change(self, emoji: str) -> bool:
+        return False
+
+    async def send_request(self, http_client, method, endpoint, **kwargs):
+        start = perf_counter()
+        try:
+            return await super().send_request(http_client, method, endpoint, **kwargs)
+        finally:
+            self.latencies.append(perf_counter() - start)
@@ -13,6 +13,8 @@ class Settings(BaseSettings):
     POINTS_COUNT: list[int] = [350, 400]
     AUTO_PLAY_GAME: bool = True
     AUTO_TASK: bool = True
+    TASK_CONCURRENCY: int = 3
+    TASK_CATALOG_TTL: int = 3600
     AUTO_DAILY_REWARD: bool = True
     AUTO_CLAIM_STARS: bool = True
     AUTO_CLAIM_COMBO: bool = True
@@ -28,6 +30,61 @@ class Settings(BaseSettings):
 
     USE_PROXY_FROM_FILE: bool = False
 
+    MAX_ACTIVE_SESSIONS: int = 100
+    SESSION_WATCH_INTERVAL: int = 30
+    GAME_INTERVAL: int = 21600
+    TASKS_INTERVAL: int = 21600
+    RANK_INTERVAL: int = 43200
+    RAFFLE_INTERVAL: int = 21600
+    WALLET_INTERVAL: int = 86400
+    GLOBAL_RATE_LIMIT: float = 20
+    ENDPOINT_RATE_LIMIT: float = 5
+    ENDPOINT_RATE_LIMITS: dict[str, float] = {}
+    RETRY_ATTEMPTS: int = 3
+    RETRY_BASE_DELAY: float = 1
+    RETRY_MAX_DELAY: float = 30
+    CIRCUIT_BREAKER_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_COOLDOWN: float = 60
+
+    RESPONSE_CACHE_TTLS: dict[str, float] = {
+        '/user/balance': 30,
+        '/user/tickets': 30,
+        '/tasks/list': 60,
+        '/tasks/puzzle': 60,
+        '/tasks/walletTask': 300,
+        '/rank/data': 60,
+    }
+
+    API_BASE_URL: str = 'https://api-web.tomarket.ai/tomarket-game/v1'
+    HTTP_POOL_LIMIT: int = 100
+    HTTP_KEEPALIVE_TIMEOUT: float = 60
+    HTTP_DNS_CACHE_TTL: int = 300
+    HTTP_POOL_IDLE_TIMEOUT: int = 600
+
+    AUTH_TOKEN_TTL: int = 3600
+    INIT_DATA_TTL: int = 86400
+    AUTH_REFRESH_MARGIN: int = 300
+
+    TG_MAX_HANDSHAKES: int = 5
+    TG_IDLE_TIMEOUT: int = 60
+    TG_FLOOD_MAX_WAIT: int = 30
+
+    LOOP_LAG_THRESHOLD: float = 0.5
+
+    LOG_LEVEL: str = 'DEBUG'
+    LOG_LEVELS: dict[str, str] = {}
+    LOG_JSON: bool = False
+    LOG_ASYNC: bool = False
+    LOG_COLLAPSE_INTERVAL: int = 0
+
+    RECORD_TRAFFIC: str = ''
+    REPLAY_TRAFFIC: str = ''
+
+    STARTUP_CHECK_TIMEOUT: float = 10
+    API_CHECK_INTERVAL: int = 3600
+    PUZZLE_CACHE_TTL: int = 3600
+    PUZZLE_NEGATIVE_TTL: int = 300
+
 
 settings = Settings()
 
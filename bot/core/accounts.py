@@ -0,0 +1,211 @@
+import asyncio
+import glob
+import json
+import os
+from time import time
+from typing import Awaitable, Callable
+
+from bot.config import settings
+from bot.utils import logger
+from .state_store import state_store
+
+SESSIONS_DIR = 'sessions'
+PROXIES_PATH = 'bot/config/proxies.txt'
+OVERRIDES_PATH = 'bot/config/accounts.json'
+WALLETS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'wallet.json')
+
+
+def parse_proxy(proxy: str) -> str:
+    from better_proxy import Proxy
+
+    return Proxy.from_str(proxy=proxy.strip()).as_url
+
+
+def read_proxies(path: str) -> list[str]:
+    with open(file=path, encoding="utf-8-sig") as file:
+        return [parse_proxy(row) for row in file if row.strip()]
+
+
+def read_json(path: str) -> dict:
+    with open(path, encoding="utf-8-sig") as file:
+        data = json.load(file)
+    if not isinstance(data, dict):
+        raise ValueError("expected an object of session names")
+    return data
+
+
+def assign_proxies(session_names: list[str], proxies: list[str],
+                   current: dict[str, str | None] | None = None) -> dict[str, str | None]:
+    """Binds each session to a proxy, sessions whose proxy is still listed keep it.
+
+    The others (new sessions, direct ones and those whose proxy went away) get the
+    proxy with the fewest sessions, which spreads a fresh start in file order.
+    """
+    current = current or {}
+    load = dict.fromkeys(proxies, 0)
+    kept = {}
+    for session_name in session_names:
+        proxy = current.get(session_name)
+        if proxy in load:
+            kept[session_name] = proxy
+            load[proxy] += 1
+
+    assignments = {}
+    for session_name in session_names:
+        proxy = kept.get(session_name)
+        if proxy is None and load:
+            proxy = min(load, key=load.get)
+            load[proxy] += 1
+        assignments[session_name] = proxy
+    return assignments
+
+
+class Account:
+    """What the bot knows about one session besides its Telegram client."""
+
+    __slots__ = ('session_name', 'proxy', 'wallet', 'overrides')
+
+    def __init__(self, session_name: str, proxy: str | None = None, wallet: str | None = None,
+                 overrides: dict | None = None):
+        self.session_name = session_name
+        self.proxy = proxy
+        self.wallet = wallet
+        self.overrides = overrides or {}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Account) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def job_enabled(self, job) -> bool:
+        if job.setting is None or job.setting not in self.overrides:
+            return job.enabled
+        return bool(self.overrides[job.setting])
+
+
+class AccountRegistry:
+    """Every account's proxy, wallet address and overrides, indexed by session name.
+
+    Built from the session files, the proxies file, `wallet.json` and the optional
+    `bot/config/accounts.json` overrides (e.g. {"my_session": {"proxy": "...",
+    "AUTO_PLAY_GAME": false}}). `refresh` only reads a file again when its mtime
+    changed, cycles look accounts up in memory. Proxy bindings are saved to the state
+    store, so a session keeps its proxy across restarts while the proxy stays listed.
+    A session file that shows up while running is only taken once it was left alone
+    for `settle` seconds, so a session that is still being created isn't started
+    halfway. `owns` limits the registry to the sessions of one worker.
+    """
+
+    def __init__(self, sessions_dir: str = SESSIONS_DIR, proxies_path: str = PROXIES_PATH,
+                 wallets_path: str = WALLETS_PATH, overrides_path: str = OVERRIDES_PATH, settle: float = 10):
+        self.sessions_dir = sessions_dir
+        self.proxies_path = proxies_path
+        self.wallets_path = wallets_path
+        self.overrides_path = overrides_path
+        self.settle = settle
+        self.owns = None
+        self.accounts = None
+        self._bindings = None
+        self._files = {}
+
+    def __len__(self) -> int:
+        return len(self.accounts or ())
+
+    def get(self, session_name: str) -> Account | None:
+        return self.accounts.get(session_name) if self.accounts is not None else None
+
+    def proxy_bindings(self) -> dict[str, str | None]:
+        return {session_name: account.proxy for session_name, account in (self.accounts or {}).items()}
+
+    def _read(self, path: str, parse: Callable, default):
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        cached = self._files.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        if mtime is None:
+            data = default
+        else:
+            try:
+                data = parse(path)
+            except (OSError, ValueError) as error:
+                # Warned once per change, the previous content stays in use until the file is fixed
+                logger.warning(f"Ignoring changes to {path}, it could not be read: {error}")
+                data = cached[1] if cached is not None else default
+        self._files[path] = (mtime, data)
+        return data
+
+    def proxies(self) -> list[str]:
+        if not settings.USE_PROXY_FROM_FILE:
+            return []
+        return self._read(self.proxies_path, read_proxies, [])
+
+    def session_names(self) -> list[str]:
+        session_names = []
+        settled_before = time() - self.settle
+        for path in glob.glob(os.path.join(self.sessions_dir, '*.session')):
+            session_name = os.path.splitext(os.path.basename(path))[0]
+            if self.owns is not None and not self.owns(session_name):
+                continue
+            if self.accounts is not None and session_name not in self.accounts:
+                try:
+                    if os.path.getmtime(path) > settled_before:
+                        continue
+                except OSError:
+                    continue
+            session_names.append(session_name)
+        return sorted(session_names)
+
+    def refresh(self) -> bool:
+        """Reads what changed on disk, True when an account was added, removed or changed."""
+        session_names = self.session_names()
+        wallets = self._read(self.wallets_path, read_json, {})
+        overrides = self._read(self.overrides_path, read_json, {})
+        if self._bindings is None:
+            self._bindings = state_store.load_proxy_bindings()
+
+        accounts, pinned = {}, set()
+        for session_name in session_names:
+            account_overrides = overrides.get(session_name)
+            account_overrides = account_overrides if isinstance(account_overrides, dict) else {}
+            wallet = wallets.get(session_name)
+            accounts[session_name] = Account(session_name,
+                                             wallet=wallet.get('address') if isinstance(wallet, dict) else None,
+                                             overrides=account_overrides)
+            if account_overrides.get('proxy'):
+                try:
+                    accounts[session_name].proxy = parse_proxy(account_overrides['proxy'])
+                    pinned.add(session_name)
+                except ValueError as error:
+                    logger.warning(f"{session_name} | Ignoring the proxy in {self.overrides_path}: {error}")
+
+        bindings = assign_proxies([session_name for session_name in session_names if session_name not in pinned],
+                                  self.proxies(), self._bindings)
+        changed_bindings = {}
+        for session_name, proxy in bindings.items():
+            accounts[session_name].proxy = proxy
+            if proxy is not None and self._bindings.get(session_name) != proxy:
+                changed_bindings[session_name] = proxy
+        if changed_bindings:
+            state_store.save_proxy_bindings(changed_bindings)
+            self._bindings.update(changed_bindings)
+
+        changed = accounts != self.accounts
+        self.accounts = accounts
+        return changed
+
+    async def run(self, interval: float, on_change: Callable[[], Awaitable[None]]) -> None:
+        pending = False
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # A change that could not be applied is tried again on the next check
+                if await asyncio.to_thread(self.refresh) or pending:
+                    pending = True
+                    await on_change()
+                    pending = False
+            except Exception as error:
+                logger.error(f"Error while reloading accounts: {error}")
+
+
+accounts = AccountRegistry()
@@ -1,7 +1,14 @@
+import asyncio
+import hashlib
 import json
-import requests
 import re
+from time import time
+
+import aiohttp
+
+from bot.config import settings
 from bot.utils import logger
+from .background import BackgroundTask
 
 baseUrl = "https://api-web.tomarket.ai/tomarket-game/v1"
 
@@ -22,70 +29,127 @@ api_endpoints = [
     r"/tasks/classmateStars",
 ]
 
-def get_main_js_format(base_url):
-    try:
-        response = requests.get(base_url)
-        response.raise_for_status()
-        content = response.text
-        
-        matches = re.findall(r'src="(/.*?/index.*?\.js)"', content)
+_endpoint_pattern = re.compile("|".join(re.escape(endpoint) for endpoint in sorted(api_endpoints, key=len, reverse=True)))
+
+
+def find_missing_endpoints(content: str) -> list[str]:
+    # One pass over the bundle; longest alternatives win, so shorter endpoints that are a
+    # prefix of a longer one (/tasks/puzzle vs /tasks/puzzleClaim) are resolved from the matches.
+    found = {match.group(0) for match in _endpoint_pattern.finditer(content)}
+    return [endpoint for endpoint in api_endpoints if not any(endpoint in item for item in found)]
+
+
+class ApiChecker(BackgroundTask):
+    """Process-wide API drift check, run on its own schedule.
+
+    Tappers only read `api_changed`; the mini-app page and JS bundle are fetched with
+    conditional GETs and the bundle is only scanned again when its hash changes.
+    """
+
+    base_url = "https://mini-app.tomarket.ai/"
+
+    def __init__(self, interval: int = 3600):
+        self.interval = interval
+        self.api_changed = False
+        self.last_check = 0
+        self._validators = {}
+        self._page = None
+        self._bundle_hash = None
+        self._bundle_verdict = None
+        self._lock = asyncio.Lock()
+
+    async def _conditional_get(self, session: aiohttp.ClientSession, url: str) -> tuple[bool, str | None]:
+        request_headers = {}
+        validators = self._validators.get(url, {})
+        if validators.get('etag'):
+            request_headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            request_headers['If-Modified-Since'] = validators['last_modified']
+
+        async with session.get(url, headers=request_headers) as response:
+            if response.status == 304:
+                return False, None
+            response.raise_for_status()
+            self._validators[url] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
+            return True, await response.text()
+
+    async def _get_main_js_formats(self, session: aiohttp.ClientSession) -> list[str] | None:
+        changed, content = await self._conditional_get(session, self.base_url)
+        if changed:
+            self._page = content
+        if not self._page:
+            return None
+
+        matches = re.findall(r'src="(/.*?/index.*?\.js)"', self._page)
         if matches:
             return sorted(set(matches), key=len, reverse=True)
-        else:
-            return None
-    except requests.RequestException as e:
-        logger.error(f"Error fetching the base URL: {e}")
         return None
 
-def get_base_api(url):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        content = response.text
-        
-        # Check if each API endpoint pattern matches any part of the JS content
-        missing_endpoints = [pattern for pattern in api_endpoints if not re.search(pattern, content)]
-        
-        if not missing_endpoints:
-            return True
-        else:
-            logger.error("<red>Missing endpoints:</red>", missing_endpoints)
-            return False
-    except requests.RequestException as e:
-        logger.error(f"Error fetching the JS file: {e}")
-        return None
+    async def _check_bundle(self, session: aiohttp.ClientSession, url: str) -> bool | None:
+        changed, content = await self._conditional_get(session, url)
+        if not changed and self._bundle_verdict is not None:
+            return self._bundle_verdict
 
-def check_base_url():
-    base_url = "https://mini-app.tomarket.ai/"
-    main_js_formats = get_main_js_format(base_url)
-
-    if main_js_formats:
-        for format in main_js_formats:
-            full_url = f"https://mini-app.tomarket.ai/{format}"
-            result = get_base_api(full_url)
-
-            if result:
-                return True
-            else:
-                return False
-    else:
-        logger.error("Could not find any main.js format. Dumping page content for inspection:")
-        try:
-            response = requests.get(base_url)
-            logger.error(response.text[:1000])
-        except requests.RequestException as e:
-            logger.error(f"Error fetching the base URL for content dump: {e}")
-        return False
-
-def get_version_info():
+        if content is None:
+            # 304 without a previous verdict (validators survived a reset), fetch unconditionally
+            self._validators.pop(url, None)
+            changed, content = await self._conditional_get(session, url)
+
+        bundle_hash = hashlib.sha256(content.encode()).hexdigest()
+        if bundle_hash == self._bundle_hash and self._bundle_verdict is not None:
+            return self._bundle_verdict
+
+        missing_endpoints = find_missing_endpoints(content)
+        if missing_endpoints:
+            logger.error(f"<red>Missing endpoints:</red> {missing_endpoints}")
+
+        self._bundle_hash = bundle_hash
+        self._bundle_verdict = not missing_endpoints
+        return self._bundle_verdict
+
+    async def check(self, timeout: float = 60) -> bool | None:
+        async with self._lock:
+            try:
+                async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+                    main_js_formats = await self._get_main_js_formats(session)
+                    if not main_js_formats:
+                        logger.error("Could not find any main.js format. Dumping page content for inspection:")
+                        logger.error((self._page or '')[:1000])
+                        result = False
+                    else:
+                        result = await self._check_bundle(session, f"https://mini-app.tomarket.ai/{main_js_formats[0]}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Error fetching the mini app: {e}")
+                result = None
+
+            self.last_check = time()
+            if result is not None:
+                self.api_changed = result is False
+            return result
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if await self.check() is False:
+                logger.error("<red>Detected api change!</red>")
+
+
+api_checker = ApiChecker(interval=settings.API_CHECK_INTERVAL)
+
+async def get_version_info(timeout: float = 10):
     try:
-        response = requests.get("https://raw.githubusercontent.com/yanpaing007/Tomarket/refs/heads/main/bot/config/combo.json")
-        response.raise_for_status()
-        data = response.json()
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+            async with session.get("https://raw.githubusercontent.com/yanpaing007/Tomarket/refs/heads/main/bot/config/combo.json") as response:
+                response.raise_for_status()
+                # Served as text/plain
+                data = await response.json(content_type=None)
         version = data.get('version', None)
         message = data.get('message', None)
         return version, message
-    except requests.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
         logger.error(f"Error fetching the version info: {e}")
         return None, None
     
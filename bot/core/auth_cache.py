@@ -0,0 +1,147 @@
+import asyncio
+import base64
+import glob
+import json
+import os
+from time import time
+
+from bot.config import settings
+from bot.utils import logger
+from .background import BackgroundTask
+
+AUTH_CACHE_PATH = 'sessions/auth_cache.json'
+
+
+def token_expiry(access_token: str, default_ttl: int) -> float:
+    # Use the real `exp` claim when the token is a JWT, otherwise assume the default lifetime
+    try:
+        payload = access_token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return float(claims['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return time() + default_ttl
+
+
+def init_data_expiry(init_data: str, ttl: int) -> float:
+    for part in init_data.split('&'):
+        if part.startswith('auth_date='):
+            try:
+                return int(part.split('=')[1]) + ttl
+            except ValueError:
+                break
+    return time() + ttl
+
+
+class AuthCache(BackgroundTask):
+    """init_data and access_token per session, persisted so restarts don't log in again.
+
+    Writes are batched: entries are marked dirty and flushed from a background task.
+    Worker processes each write a shard file (`auth_cache.<n>.json`) with their own
+    sessions, reads merge every file and keep the newest login per session.
+    """
+
+    def __init__(self, path: str = AUTH_CACHE_PATH, flush_interval: int = 5):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.sessions = None
+        self._shard_path = None
+        self._entries = None
+        self._dirty = False
+
+    @property
+    def write_path(self) -> str:
+        return self._shard_path or self.path
+
+    def use_shard(self, index: int, session_names) -> None:
+        root, ext = os.path.splitext(self.path)
+        self._shard_path = f"{root}.{index}{ext}"
+        self.sessions = set(session_names)
+        self._entries = None
+
+    def adopt(self, session_names) -> None:
+        """Takes over sessions added while running, together with the logins cached for them."""
+        if self.sessions is None:
+            return
+        added = set(session_names) - self.sessions
+        if not added:
+            return
+        self.sessions |= added
+        if self._entries is not None:
+            for session_name, entry in self._read_all(added).items():
+                self._entries.setdefault(session_name, entry)
+
+    @staticmethod
+    def _read(path: str) -> dict:
+        try:
+            with open(path, 'r') as cache_file:
+                return json.load(cache_file)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError as json_err:
+            logger.warning(f"Ignoring unreadable auth cache {path}: {json_err}")
+            return {}
+
+    def _read_all(self, sessions) -> dict:
+        root, ext = os.path.splitext(self.path)
+        entries = {}
+        for path in [self.path] + sorted(glob.glob(f"{glob.escape(root)}.*{ext}")):
+            for session_name, entry in self._read(path).items():
+                if sessions is not None and session_name not in sessions:
+                    continue
+                if entry.get('expires_at', 0) >= entries.get(session_name, {}).get('expires_at', 0):
+                    entries[session_name] = entry
+        return entries
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            self._entries = self._read_all(self.sessions)
+        return self._entries
+
+    def get(self, session_name: str) -> dict | None:
+        entry = self._load().get(session_name)
+        if entry and entry.get('init_data_expires_at', 0) > time():
+            return entry
+        return None
+
+    def put(self, session_name: str, ref_id: str, init_data: str, access_token: str, expires_at: float) -> None:
+        self._load()[session_name] = {
+            'ref_id': ref_id,
+            'init_data': init_data,
+            'init_data_expires_at': init_data_expiry(init_data, settings.INIT_DATA_TTL),
+            'access_token': access_token,
+            'expires_at': expires_at,
+        }
+        self._dirty = True
+
+    def invalidate(self, session_name: str) -> None:
+        if self._load().pop(session_name, None) is not None:
+            self._dirty = True
+
+    def _write(self, entries: dict) -> None:
+        path = self.write_path
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as cache_file:
+            json.dump(entries, cache_file)
+        os.replace(tmp_path, path)
+
+    async def flush(self) -> None:
+        if not self._dirty:
+            return
+        self._dirty = False
+        try:
+            await asyncio.to_thread(self._write, dict(self._load()))
+        except OSError as error:
+            self._dirty = True
+            logger.error(f"Failed to save auth cache: {error}")
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self) -> None:
+        self.stop()
+        await self.flush()
+
+
+auth_cache = AuthCache()
@@ -0,0 +1,18 @@
+import asyncio
+
+
+class BackgroundTask:
+    """Base for the process-wide helpers that keep one `run()` loop going in the background."""
+
+    _task: asyncio.Task | None = None
+
+    async def run(self) -> None:
+        raise NotImplementedError
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
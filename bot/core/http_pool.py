@@ -0,0 +1,86 @@
+import asyncio
+from contextlib import asynccontextmanager
+from time import time
+
+import aiohttp
+from aiohttp_proxy import ProxyConnector
+
+from bot.config import settings
+from bot.utils import logger
+from .background import BackgroundTask
+from .headers import headers
+
+
+class SessionPool(BackgroundTask):
+    """One long-lived ClientSession per egress (proxy URL, or None for direct).
+
+    Accounts on the same proxy share its keep-alive connections and DNS cache between
+    cycles. Sessions nobody has borrowed for `idle_timeout` seconds are closed.
+    Per-account headers (Authorization, User-Agent) must be sent per request, cookies are not kept.
+    """
+
+    def __init__(self, limit: int = 100, keepalive_timeout: float = 60, dns_cache_ttl: int = 300, idle_timeout: int = 600):
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._borrowers = {}
+        self._last_used = {}
+
+    def _create(self, proxy: str | None) -> aiohttp.ClientSession:
+        connector_kwargs = dict(limit=self.limit, keepalive_timeout=self.keepalive_timeout, ttl_dns_cache=self.dns_cache_ttl)
+        connector = ProxyConnector.from_url(proxy, **connector_kwargs) if proxy else aiohttp.TCPConnector(**connector_kwargs)
+        # The session is shared by accounts, a cookie one of them is sent must not reach the others
+        return aiohttp.ClientSession(headers=headers, connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+
+    def acquire(self, proxy: str | None) -> aiohttp.ClientSession:
+        session = self._sessions.get(proxy)
+        if session is None or session.closed:
+            session = self._sessions[proxy] = self._create(proxy)
+        self._borrowers[proxy] = self._borrowers.get(proxy, 0) + 1
+        self._last_used[proxy] = time()
+        return session
+
+    def release(self, proxy: str | None) -> None:
+        self._borrowers[proxy] = max(0, self._borrowers.get(proxy, 0) - 1)
+        self._last_used[proxy] = time()
+
+    @asynccontextmanager
+    async def session(self, proxy: str | None):
+        http_client = self.acquire(proxy)
+        try:
+            yield http_client
+        finally:
+            self.release(proxy)
+
+    async def evict_idle(self) -> None:
+        deadline = time() - self.idle_timeout
+        for proxy, session in list(self._sessions.items()):
+            if self._borrowers.get(proxy, 0) == 0 and self._last_used.get(proxy, 0) < deadline:
+                del self._sessions[proxy]
+                self._borrowers.pop(proxy, None)
+                self._last_used.pop(proxy, None)
+                await session.close()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(max(1, self.idle_timeout / 4))
+            try:
+                await self.evict_idle()
+            except Exception as error:
+                logger.error(f"Error while closing idle HTTP sessions: {error}")
+
+    async def close(self) -> None:
+        self.stop()
+        sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            await session.close()
+
+
+session_pool = SessionPool(
+    limit=settings.HTTP_POOL_LIMIT,
+    keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+    dns_cache_ttl=settings.HTTP_DNS_CACHE_TTL,
+    idle_timeout=settings.HTTP_POOL_IDLE_TIMEOUT
+)
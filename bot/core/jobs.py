@@ -0,0 +1,36 @@
+from bot.config import settings
+
+
+class Job:
+    """A feature of the account cycle with its own cadence.
+
+    `setting` is the AUTO_* flag that enables it (None means always on), `interval` is the
+    fallback cadence for jobs whose next due time isn't dictated by the API.
+    The work itself is `Tapper.job_<name>`, which returns the job's next due timestamp.
+    """
+
+    __slots__ = ('name', 'setting', 'interval')
+
+    def __init__(self, name: str, setting: str | None = None, interval: int = 0):
+        self.name = name
+        self.setting = setting
+        self.interval = interval
+
+    @property
+    def enabled(self) -> bool:
+        return self.setting is None or bool(getattr(settings, self.setting))
+
+
+# Run order within a cycle: daily and combo grant game passes and stars, so they come
+# before the game and rank jobs they trigger
+JOBS = (
+    Job('farm'),
+    Job('daily', 'AUTO_DAILY_REWARD'),
+    Job('combo', 'AUTO_CLAIM_COMBO', interval=3600),
+    Job('game', 'AUTO_PLAY_GAME', interval=settings.GAME_INTERVAL),
+    Job('tasks', 'AUTO_TASK', interval=settings.TASKS_INTERVAL),
+    Job('rank', interval=settings.RANK_INTERVAL),
+    Job('raffle', 'AUTO_RAFFLE', interval=settings.RAFFLE_INTERVAL),
+    Job('wallet', 'AUTO_ADD_WALLET', interval=settings.WALLET_INTERVAL),
+)
+JOBS_BY_NAME = {job.name: job for job in JOBS}
@@ -0,0 +1,86 @@
+import asyncio
+from time import monotonic
+
+from bot.config import settings
+
+
+class TokenBucket:
+    """Token bucket whose rate backs off when the API pushes back and recovers when it stops."""
+
+    def __init__(self, rate: float, capacity: float | None = None, min_rate: float | None = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 20
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = monotonic()
+        self._last_tighten = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        # The lock keeps waiters in FIFO order so no account is starved under load
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def tighten(self) -> None:
+        # A burst of failures from concurrent requests counts as one signal
+        now = monotonic()
+        if now - self._last_tighten < 1:
+            return
+        self._last_tighten = now
+        self._refill()
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    def relax(self) -> None:
+        if self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class RateLimiter:
+    """Global request budget plus one budget per endpoint, shared by every account."""
+
+    def __init__(self, global_rate: float, endpoint_rate: float, endpoint_rates: dict[str, float] | None = None):
+        self.endpoint_rate = endpoint_rate
+        self.endpoint_rates = endpoint_rates or {}
+        self.global_bucket = TokenBucket(global_rate)
+        self.buckets = {}
+
+    def bucket(self, endpoint: str) -> TokenBucket:
+        bucket = self.buckets.get(endpoint)
+        if bucket is None:
+            bucket = self.buckets[endpoint] = TokenBucket(self.endpoint_rates.get(endpoint, self.endpoint_rate))
+        return bucket
+
+    async def acquire(self, endpoint: str) -> None:
+        await self.bucket(endpoint).acquire()
+        await self.global_bucket.acquire()
+
+    def feedback(self, endpoint: str, http_status: int, payload=None) -> None:
+        bucket = self.bucket(endpoint)
+        if http_status == 429 or http_status >= 500:
+            bucket.tighten()
+            self.global_bucket.tighten()
+        elif isinstance(payload, dict) and payload.get('status') == 500:
+            # Payload errors are endpoint specific (e.g. a claim that came too early)
+            bucket.tighten()
+        elif payload is not None:
+            bucket.relax()
+            self.global_bucket.relax()
+
+
+rate_limiter = RateLimiter(
+    global_rate=settings.GLOBAL_RATE_LIMIT,
+    endpoint_rate=settings.ENDPOINT_RATE_LIMIT,
+    endpoint_rates=settings.ENDPOINT_RATE_LIMITS
+)
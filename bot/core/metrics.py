@@ -0,0 +1,220 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable
+
+from aiohttp import web
+
+from bot.utils import logger
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+CYCLE_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def remove(self, **labels) -> None:
+        self.values.pop(self._key(labels), None)
+
+    def snapshot(self) -> dict:
+        return dict(self.values)
+
+    def samples(self, values: dict, labelnames: tuple):
+        for key, value in values.items():
+            yield self.name, format_labels(labelnames, key), value
+
+    def render(self, values: dict | None = None, labelnames: tuple | None = None) -> list[str]:
+        values = dict(self.values) if values is None else values
+        labelnames = self.labelnames if labelnames is None else labelnames
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines += [f"{name}{labels} {format_value(value)}" for name, labels, value in self.samples(values, labelnames)]
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        self.values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        series = self.values.get(key)
+        if series is None:
+            # Per-bucket counts plus the +Inf bucket, then sum
+            series = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def snapshot(self) -> dict:
+        return {key: list(series) for key, series in list(self.values.items())}
+
+    def samples(self, values: dict, labelnames: tuple):
+        for key, series in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                yield f"{self.name}_bucket", format_labels(labelnames, key, f'le="{format_value(bound)}"'), cumulative
+            yield f"{self.name}_sum", format_labels(labelnames, key), series[-1]
+            yield f"{self.name}_count", format_labels(labelnames, key), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> dict[str, dict]:
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def render_workers(self, snapshots: dict[int, dict]) -> str:
+        """Render this process's metrics plus the snapshots of worker processes, labelled by worker."""
+        lines = []
+        for name, metric in self.metrics.items():
+            values = {('parent',) + key: value for key, value in metric.snapshot().items()}
+            for worker, snapshot in sorted(snapshots.items()):
+                values.update({(str(worker),) + key: value for key, value in snapshot.get(name, {}).items()})
+            lines += metric.render(values, ('worker',) + metric.labelnames)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram(
+    'tomarket_request_duration_seconds', 'Latency of Tomarket API requests', ('endpoint',))
+PROXY_REQUEST_DURATION = registry.histogram(
+    'tomarket_proxy_request_duration_seconds', 'Latency of Tomarket API requests per proxy', ('proxy',))
+REQUESTS = registry.counter(
+    'tomarket_requests_total', 'Tomarket API requests by HTTP status', ('endpoint', 'status'))
+REQUEST_ERRORS = registry.counter(
+    'tomarket_request_errors_total', 'Failed Tomarket API requests by failure class', ('endpoint', 'kind'))
+REQUESTS_IN_FLIGHT = registry.gauge(
+    'tomarket_requests_in_flight', 'Tomarket API requests waiting for a response', ('endpoint',))
+
+TELEGRAM_DURATION = registry.histogram(
+    'tomarket_telegram_call_duration_seconds', 'Latency of Telegram (pyrogram) calls', ('method',))
+TELEGRAM_ERRORS = registry.counter(
+    'tomarket_telegram_errors_total', 'Failed Telegram (pyrogram) calls', ('method', 'error'))
+TELEGRAM_IN_FLIGHT = registry.gauge(
+    'tomarket_telegram_calls_in_flight', 'Telegram (pyrogram) calls waiting for a response', ('method',))
+TELEGRAM_FLOOD_HELD = registry.counter(
+    'tomarket_telegram_flood_held_total', 'Telegram calls held back or rescheduled by an active FloodWait', ('method',))
+
+CYCLE_DURATION = registry.histogram(
+    'tomarket_cycle_duration_seconds', 'Duration of account cycles', buckets=CYCLE_BUCKETS)
+ACCOUNT_CYCLE_DURATION = registry.gauge(
+    'tomarket_account_cycle_duration_seconds', 'Duration of the last cycle of an account', ('session',))
+ACCOUNT_NEXT_DUE = registry.gauge(
+    'tomarket_account_next_due_seconds', 'Time to the next due job of an account, as of its last cycle', ('session',))
+SCHEDULER_LATENESS = registry.histogram(
+    'tomarket_scheduler_lateness_seconds', 'Delay between a job being due and a worker starting it')
+SCHEDULER_ACTIVE = registry.gauge(
+    'tomarket_scheduler_active_jobs', 'Scheduler jobs currently running')
+
+PUZZLE_EVENTS = registry.counter(
+    'tomarket_puzzle_resolver_total', 'Daily combo lookups by outcome (hits, negative_hits, coalesced, fetches, '
+    'remote_requests, local_fallbacks, local_reloads)', ('event',))
+
+LOOP_LAG = registry.histogram(
+    'tomarket_event_loop_lag_seconds', 'Event loop scheduling delay', buckets=LAG_BUCKETS)
+LOOP_LAG_CURRENT = registry.gauge(
+    'tomarket_event_loop_lag_current_seconds', 'Event loop scheduling delay of the last heartbeat')
+LOOP_STALLS = registry.counter(
+    'tomarket_event_loop_stalls_total', 'Times the event loop was blocked past the watchdog threshold')
+
+
+@contextmanager
+def track_telegram(method: str):
+    TELEGRAM_IN_FLIGHT.inc(method=method)
+    start = perf_counter()
+    try:
+        yield
+    except Exception as error:
+        TELEGRAM_ERRORS.inc(method=method, error=type(error).__name__)
+        raise
+    finally:
+        TELEGRAM_DURATION.observe(perf_counter() - start, method=method)
+        TELEGRAM_IN_FLIGHT.dec(method=method)
+
+
+async def start_server(port: int, host: str = '127.0.0.1', render: Callable[[], str] = registry.render) -> web.AppRunner:
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(body=render().encode(), headers={'Content-Type': CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Serving metrics on <cyan>http://{host}:{port}/metrics</cyan>")
+    return runner
@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class Balance:
+    available_balance: float = 0
+    play_passes: int = 0
+    farm_end_at: float | None = None
+
+    @classmethod
+    def from_data(cls, data: dict) -> 'Balance':
+        farming = data.get('farming')
+        return cls(
+            available_balance=data.get('available_balance', 0),
+            play_passes=data.get('play_passes', 0),
+            farm_end_at=farming.get('end_at') if isinstance(farming, dict) else None
+        )
+
+
+@dataclass(slots=True)
+class Farm:
+    end_at: float = 0
+    claim_this_time: float = 0
+
+    @classmethod
+    def from_data(cls, data: dict) -> 'Farm':
+        return cls(end_at=data.get('end_at', 0), claim_this_time=data.get('claim_this_time', 0))
+
+
+@dataclass(slots=True)
+class Task:
+    """An entry of `/tasks/list`. Built once per catalog version and shared by every account."""
+    task_id: int
+    name: str = ''
+    type: str | None = None
+    status: int | None = None
+    enable: bool = False
+    invisible: bool = False
+    wait_second: int = 0
+    score: int | str = 'unknown'
+    start_time: str | None = None
+    end_time: str | None = None
+
+    @classmethod
+    def from_data(cls, data: dict) -> 'Task':
+        return cls(
+            task_id=data['taskId'],
+            name=data.get('name', ''),
+            type=data.get('type'),
+            status=data.get('status'),
+            enable=bool(data.get('enable')),
+            invisible=bool(data.get('invisible', False)),
+            wait_second=data.get('waitSecond') or 0,
+            score=data.get('score', 'unknown'),
+            start_time=data.get('startTime'),
+            end_time=data.get('endTime')
+        )
+
+
+@dataclass(slots=True)
+class Combo:
+    task_id: int | None = None
+    status: int = 0
+    end_time: str | None = None
+    star: int = 0
+    games: int = 0
+    score: int = 0
+
+    @classmethod
+    def from_data(cls, data: dict) -> 'Combo':
+        return cls(
+            task_id=data.get('taskId'),
+            status=data.get('status') or 0,
+            end_time=data.get('endTime'),
+            star=data.get('star', 0),
+            games=data.get('games', 0),
+            score=data.get('score', 0)
+        )
+
+
+@dataclass(slots=True)
+class RankData:
+    unused_stars: int = 0
+    current_rank: str = 'Unknown rank'
+
+    @classmethod
+    def from_data(cls, data: dict) -> 'RankData':
+        try:
+            unused_stars = int(float(data.get('unusedStars', 0)))
+        except (TypeError, ValueError):
+            unused_stars = 0
+        current_rank = data.get('currentRank')
+        return cls(
+            unused_stars=unused_stars,
+            current_rank=current_rank.get('name', 'Unknown rank') if isinstance(current_rank, dict) else 'Unknown rank'
+        )
+
+
+@dataclass(slots=True)
+class RaffleResult:
+    amount: float = 0
+    type: str | int = 0
+
+    @classmethod
+    def from_data(cls, data: dict) -> 'RaffleResult | None':
+        results = data.get('results') or []
+        if not results:
+            return None
+        return cls(amount=results[0].get('amount', 0), type=results[0].get('type', 0))
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+from time import time
+
+import aiohttp
+
+from bot.config import settings
+from bot.utils import logger
+from .metrics import PUZZLE_EVENTS
+from .single_flight import SingleFlight
+
+PUZZLE_URLS = [
+    "https://raw.githubusercontent.com/yanpaing007/Tomarket/refs/heads/main/bot/config/combo.json",
+    "https://raw.githubusercontent.com/zuydd/database/refs/heads/main/tomarket.json"
+]
+LOCAL_COMBO_PATH = 'bot/config/combo.json'
+
+
+class PuzzleResolver:
+    """Process-wide daily combo lookup.
+
+    Answers are cached per task_id (misses too, for a shorter time) and concurrent callers
+    for the same task_id share one in-flight fetch.
+    """
+
+    def __init__(self, ttl: int = 3600, negative_ttl: int = 300):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._cache = {}
+        self._flights = SingleFlight()
+        self._local_mtime = None
+        self._local_puzzle = None
+        self.stats = {'hits': 0, 'negative_hits': 0, 'coalesced': 0, 'fetches': 0, 'remote_requests': 0,
+                      'local_fallbacks': 0, 'local_reloads': 0}
+
+    def _count(self, event: str) -> None:
+        self.stats[event] += 1
+        PUZZLE_EVENTS.inc(event=event)
+
+    async def resolve(self, task_id):
+        self._reload_local()
+
+        cached = self._cache.get(task_id)
+        if cached and cached[1] > time():
+            self._count('hits' if cached[0] is not None else 'negative_hits')
+            return cached[0]
+
+        if task_id in self._flights:
+            self._count('coalesced')
+        return await self._flights.do(task_id, lambda: self._resolve(task_id))
+
+    async def _resolve(self, task_id):
+        code = await self._fetch(task_id)
+        self._cache[task_id] = (code, time() + (self.ttl if code is not None else self.negative_ttl))
+        logger.info(f"Puzzle cache | task {task_id} resolved | {self.stats}")
+        return code
+
+    async def _fetch(self, task_id):
+        self._count('fetches')
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+            for idx, url in enumerate(PUZZLE_URLS):
+                repo_type = "main" if idx == 0 else "backup"
+                try:
+                    self._count('remote_requests')
+                    async with session.get(url) as response:
+                        if response.status != 200:
+                            logger.error(f"Failed to retrieve puzzle from {repo_type} repo. Status code: {response.status}")
+                            continue
+                        try:
+                            data = json.loads(await response.text())
+                        except json.JSONDecodeError as json_err:
+                            logger.error(f"Error parsing JSON from {repo_type} repo: {json_err}")
+                            continue
+
+                        puzzle = data.get('puzzle', None)
+                        if puzzle and puzzle.get('task_id') == task_id:
+                            logger.info(f"Puzzle retrieved successfully from {repo_type} repo: {puzzle}")
+                            return puzzle.get('code')
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.error(f"Exception occurred while retrieving puzzle from {repo_type} repo: {e}")
+
+        logger.info("Puzzle not found in main or backup repo, trying from local combo.json...")
+        self._count('local_fallbacks')
+        return self.get_local(task_id)
+
+    def _reload_local(self) -> None:
+        try:
+            mtime = os.stat(LOCAL_COMBO_PATH).st_mtime
+        except FileNotFoundError:
+            if self._local_mtime is not None:
+                logger.error("Local file combo.json not found.")
+            self._local_mtime, self._local_puzzle = None, None
+            return
+
+        if mtime == self._local_mtime:
+            return
+
+        self._local_mtime = mtime
+        self._count('local_reloads')
+        try:
+            with open(LOCAL_COMBO_PATH, 'r') as local_file:
+                self._local_puzzle = json.load(local_file).get('puzzle', None)
+        except json.JSONDecodeError as json_err:
+            logger.error(f"Error parsing JSON from local file: {json_err}")
+            self._local_puzzle = None
+
+        # The user may have just written the answer we failed to find, forget the misses
+        self._cache = {task_id: entry for task_id, entry in self._cache.items() if entry[0] is not None}
+
+    def get_local(self, task_id):
+        self._reload_local()
+        puzzle = self._local_puzzle
+        if puzzle and puzzle.get('task_id') == task_id:
+            logger.info(f"Puzzle retrieved successfully from local file: {puzzle}")
+            return puzzle.get('code')
+
+        logger.info(f"Puzzle with {task_id} not found in local file.Please change the task_id and code in combo.json if you knew the code.")
+        return None
+
+
+puzzle_resolver = PuzzleResolver(ttl=settings.PUZZLE_CACHE_TTL, negative_ttl=settings.PUZZLE_NEGATIVE_TTL)
@@ -1,10 +1,10 @@
-from pyrogram import Client
-
 from bot.config import settings
 from bot.utils import logger
 
 
 async def register_sessions() -> None:
+    from pyrogram import Client
+
     API_ID = settings.API_ID
     API_HASH = settings.API_HASH
 
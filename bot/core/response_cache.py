@@ -0,0 +1,80 @@
+import json
+from time import monotonic
+from typing import Awaitable, Callable
+
+from .single_flight import SingleFlight
+
+# Reads invalidated by each write, a write doesn't have to be listed when it changes nothing we read
+INVALIDATES = {
+    '/farm/claim': ('/user/balance',),
+    '/farm/start': ('/user/balance',),
+    '/daily/claim': ('/user/balance',),
+    '/game/play': ('/user/balance',),
+    '/game/claim': ('/user/balance',),
+    '/tasks/start': ('/tasks/list',),
+    '/tasks/check': ('/tasks/list',),
+    '/tasks/claim': ('/tasks/list', '/user/balance', '/rank/data'),
+    '/tasks/puzzleClaim': ('/tasks/puzzle', '/user/balance', '/rank/data'),
+    '/tasks/classmateStars': ('/tasks/classmateTask', '/rank/data'),
+    '/spin/raffle': ('/user/tickets', '/user/balance'),
+    '/rank/create': ('/rank/data',),
+    '/rank/upgrade': ('/rank/data',),
+    '/tasks/address': ('/tasks/walletTask',),
+    '/tasks/deleteAddress': ('/tasks/walletTask',),
+    '/user/login': ('*',),
+}
+
+
+class ResponseCache:
+    """Per-account cache for idempotent reads made through `make_request`.
+
+    Only endpoints with a TTL are cached, and only successful (`status: 0`) payloads.
+    Identical concurrent reads share one request. Writes drop the reads they affect,
+    including reads still in flight.
+    """
+
+    def __init__(self, ttls: dict[str, float]):
+        self.ttls = ttls
+        self._entries = {}
+        self._flights = SingleFlight()
+        self._generations = {}
+        self.hits = 0
+        self.coalesced = 0
+
+    def cacheable(self, endpoint: str | None) -> bool:
+        return self.ttls.get(endpoint, 0) > 0
+
+    @staticmethod
+    def key(endpoint: str, body) -> tuple:
+        return endpoint, json.dumps(body, sort_keys=True, default=str) if body is not None else None
+
+    async def get(self, endpoint: str, body, fetch: Callable[[], Awaitable]):
+        key = self.key(endpoint, body)
+        entry = self._entries.get(key)
+        if entry and entry[0] > monotonic():
+            self.hits += 1
+            return entry[1]
+
+        if key in self._flights:
+            self.coalesced += 1
+        return await self._flights.do(key, lambda: self._fetch(endpoint, key, fetch))
+
+    async def _fetch(self, endpoint: str, key: tuple, fetch: Callable[[], Awaitable]):
+        generation = self._generations.get(endpoint, 0)
+        data = await fetch()
+        if isinstance(data, dict) and data.get('status') == 0 and self._generations.get(endpoint, 0) == generation:
+            self._entries[key] = (monotonic() + self.ttls[endpoint], data)
+        return data
+
+    def invalidate(self, endpoint: str | None) -> None:
+        for read_endpoint in INVALIDATES.get(endpoint, ()):
+            if read_endpoint == '*':
+                self.clear()
+                return
+            self._generations[read_endpoint] = self._generations.get(read_endpoint, 0) + 1
+            self._entries = {key: entry for key, entry in self._entries.items() if key[0] != read_endpoint}
+
+    def clear(self) -> None:
+        for endpoint in self.ttls:
+            self._generations[endpoint] = self._generations.get(endpoint, 0) + 1
+        self._entries.clear()
@@ -0,0 +1,211 @@
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from random import uniform
+from time import monotonic
+from typing import Awaitable, Callable
+
+import aiohttp
+from aiohttp_proxy.errors import ProxyError, SocksError
+
+from bot.config import settings
+from bot.exceptions import RequestError, CircuitOpen
+from bot.utils import logger
+
+NETWORK = 'network'
+TIMEOUT = 'timeout'
+SERVER = 'server'
+RATE_LIMITED = 'rate_limited'
+PAYLOAD = 'payload'
+UNAUTHORIZED = 'unauthorized'
+
+# Failures that say the endpoint itself is unhealthy, the others count as a live endpoint
+BREAKER_KINDS = {SERVER}
+# Failures that may only be the account's proxy, counted per egress so a dead proxy doesn't stop the fleet
+EGRESS_KINDS = {NETWORK, TIMEOUT}
+
+# Reads can be repeated on any transient failure. A write is only repeated when the server
+# certainly didn't act on it, and its `status: 500` payload is an answer (e.g. nothing to claim)
+IDEMPOTENT_ENDPOINTS = {
+    '/user/balance', '/user/tickets', '/tasks/list', '/tasks/puzzle', '/tasks/classmateTask',
+    '/tasks/walletTask', '/rank/data', '/rank/evaluate', '/rank/blacklist',
+}
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def classify_exception(endpoint: str | None, error: Exception) -> RequestError | None:
+    if isinstance(error, RequestError):
+        return error
+    if isinstance(error, asyncio.TimeoutError):
+        return RequestError(endpoint, TIMEOUT, str(error) or 'request timed out')
+    if isinstance(error, (aiohttp.ClientConnectorError, ProxyError, SocksError)):
+        # The connection (or the proxy's tunnel) never came up, so the request wasn't sent
+        return RequestError(endpoint, NETWORK, str(error) or type(error).__name__, sent=False)
+    if isinstance(error, (aiohttp.ClientError, OSError)):
+        return RequestError(endpoint, NETWORK, str(error) or type(error).__name__)
+    return None
+
+
+def classify_response(endpoint: str | None, http_status: int, headers, payload) -> RequestError | None:
+    payload_status = payload.get('status') if isinstance(payload, dict) else None
+    if http_status == 401 or payload_status == 401:
+        return RequestError(endpoint, UNAUTHORIZED, f"HTTP {http_status}")
+    if http_status == 429:
+        return RequestError(endpoint, RATE_LIMITED, f"HTTP {http_status}", parse_retry_after(headers.get('Retry-After')))
+    if http_status >= 500:
+        # 503 is the server turning the request away, on other 5xx a write may have been applied
+        return RequestError(endpoint, SERVER, f"HTTP {http_status}", parse_retry_after(headers.get('Retry-After')),
+                            sent=http_status != 503)
+    if payload_status == 500 and endpoint in IDEMPOTENT_ENDPOINTS:
+        return RequestError(endpoint, PAYLOAD, str(payload.get('message') or 'status 500'))
+    return None
+
+
+class CircuitBreaker:
+    """Stops every account from calling an endpoint after `threshold` consecutive failures.
+
+    Once `cooldown` seconds have passed a single request is let through, its outcome
+    closes the breaker or opens it for another cooldown.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 60):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0
+        return max(0.0, self.opened_at + self.cooldown - monotonic())
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self._probing or self.retry_in() > 0:
+            return False
+        self._probing = True
+        return True
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def abandon(self) -> None:
+        # The probe ended without an outcome for the endpoint, the next request probes instead
+        self._probing = False
+
+    def failure(self) -> bool:
+        """Record a failure, returns True if it opened the breaker."""
+        self.failures += 1
+        if self._probing or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened_at = monotonic()
+            self._probing = False
+            return True
+        return False
+
+
+class RetryPolicy:
+    """Jittered exponential backoff for API requests, with circuit breakers shared by every account.
+
+    Server errors trip a breaker per endpoint, connection errors and timeouts one per
+    `(egress, endpoint)`, where egress is the proxy the request went through.
+    """
+
+    def __init__(self, attempts: int = 3, base_delay: float = 1, max_delay: float = 30,
+                 breaker_threshold: int = 5, breaker_cooldown: float = 60,
+                 job_base_delay: float = 30, job_max_delay: float = 600):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.job_base_delay = job_base_delay
+        self.job_max_delay = job_max_delay
+        self.breakers = {}
+
+    def breaker(self, key) -> CircuitBreaker:
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers[key] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        return breaker
+
+    @staticmethod
+    def retryable(error: RequestError) -> bool:
+        if error.kind == UNAUTHORIZED:
+            return False
+        return error.endpoint in IDEMPOTENT_ENDPOINTS or not error.sent or error.kind == RATE_LIMITED
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter keeps accounts that failed together from retrying together
+        return uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def job_delay(self, error: RequestError, failures: int = 0) -> float:
+        """Delay before a job that failed `failures + 1` times in a row runs again."""
+        delay = min(self.job_max_delay, self.job_base_delay * 2 ** failures)
+        return max(uniform(delay / 2, delay), error.retry_after or 0)
+
+    async def call(self, endpoint: str | None, send: Callable[[], Awaitable], egress: str | None = None):
+        endpoint_breaker = self.breaker(endpoint)
+        egress_breaker = self.breaker((egress, endpoint))
+        for attempt in range(self.attempts):
+            if not endpoint_breaker.allow():
+                raise CircuitOpen(endpoint, endpoint_breaker.retry_in())
+            if not egress_breaker.allow():
+                endpoint_breaker.abandon()
+                raise CircuitOpen(endpoint, egress_breaker.retry_in())
+            try:
+                result = await send()
+            except RequestError as error:
+                if error.kind in EGRESS_KINDS:
+                    # The request may never have reached the server, that says nothing about the endpoint
+                    endpoint_breaker.abandon()
+                    breaker, via = egress_breaker, f" via {egress}" if egress else ""
+                else:
+                    egress_breaker.success()
+                    breaker, via = endpoint_breaker, ""
+                if error.kind not in BREAKER_KINDS | EGRESS_KINDS:
+                    breaker.success()
+                elif breaker.failure():
+                    logger.warning(f"Circuit opened for <light-red>{endpoint}</light-red>{via} after "
+                                   f"{breaker.failures} failures, pausing it for {breaker.cooldown}s")
+                if not self.retryable(error) or attempt + 1 >= self.attempts:
+                    raise
+                # A server asking for more than we'd wait inline gets the job rescheduled instead
+                if error.retry_after is not None and error.retry_after > self.max_delay:
+                    raise
+                await asyncio.sleep(max(self.backoff(attempt), error.retry_after or 0))
+            except BaseException:
+                # Unclassified errors (a bug, cancellation) say nothing about the endpoint
+                endpoint_breaker.abandon()
+                egress_breaker.abandon()
+                raise
+            else:
+                endpoint_breaker.success()
+                egress_breaker.success()
+                return result
+
+retry_policy = RetryPolicy(
+    attempts=settings.RETRY_ATTEMPTS,
+    base_delay=settings.RETRY_BASE_DELAY,
+    max_delay=settings.RETRY_MAX_DELAY,
+    breaker_threshold=settings.CIRCUIT_BREAKER_THRESHOLD,
+    breaker_cooldown=settings.CIRCUIT_BREAKER_COOLDOWN
+)
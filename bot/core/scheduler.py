@@ -0,0 +1,117 @@
+import asyncio
+import heapq
+import itertools
+from time import time
+from typing import Awaitable, Callable
+
+from bot.exceptions import InvalidSession
+from bot.utils import logger
+from .metrics import SCHEDULER_LATENESS, SCHEDULER_ACTIVE
+
+Job = Callable[[], Awaitable[float | None]]
+
+
+class Scheduler:
+    """Deadline scheduler for account cycles.
+
+    Each account is a key with one pending due time in a heap. A fixed pool of workers
+    runs only the keys that are due, so idle accounts cost a heap entry instead of a
+    sleeping coroutine with an open session. A job returns its next due timestamp
+    (or None to be dropped).
+    """
+
+    def __init__(self, workers: int = 100, retry_delay: int = 600):
+        self.workers = workers
+        self.retry_delay = retry_delay
+        self._heap = []
+        self._jobs = {}
+        self._due = {}
+        self._running = set()
+        self._seq = itertools.count()
+        self._queue = asyncio.Queue(maxsize=workers)
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    @property
+    def active(self) -> int:
+        return len(self._running)
+
+    def add(self, key: str, job: Job, due: float | None = None) -> None:
+        self._jobs[key] = job
+        self.reschedule(key, time() if due is None else due)
+
+    def remove(self, key: str) -> None:
+        # A running job finishes its current cycle and is then not rescheduled
+        self._jobs.pop(key, None)
+        self._due.pop(key, None)
+
+    def reschedule(self, key: str, due: float) -> None:
+        if key not in self._jobs:
+            return
+        self._due[key] = due
+        if key in self._running:
+            return
+        # Older heap entries for the key become stale and are skipped when popped
+        heapq.heappush(self._heap, (due, next(self._seq), key))
+        self._wakeup.set()
+
+    def next_due(self, key: str) -> float | None:
+        return self._due.get(key)
+
+    async def _dispatch(self) -> None:
+        while True:
+            self._wakeup.clear()
+            while self._heap:
+                due, _, key = self._heap[0]
+                if self._due.get(key) != due or key in self._running:
+                    heapq.heappop(self._heap)
+                    continue
+                if due > time():
+                    break
+                heapq.heappop(self._heap)
+                self._running.add(key)
+                await self._queue.put((key, due))
+
+            timeout = self._heap[0][0] - time() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self) -> None:
+        while True:
+            key, due = await self._queue.get()
+            job = self._jobs.get(key)
+            next_due = None
+            SCHEDULER_LATENESS.observe(max(0.0, time() - due))
+            SCHEDULER_ACTIVE.inc()
+            try:
+                if job is not None:
+                    next_due = await job()
+            except InvalidSession:
+                logger.error(f"{key} | Invalid Session")
+                self.remove(key)
+            except Exception as error:
+                logger.error(f"{key} | Unknown error: {error}")
+                logger.info(f'{key} | Sleep <light-red>{round(self.retry_delay / 60)}m.</light-red>')
+                next_due = time() + self.retry_delay
+            finally:
+                SCHEDULER_ACTIVE.dec()
+                self._running.discard(key)
+                self._queue.task_done()
+
+            if next_due is None:
+                self.remove(key)
+            else:
+                self.reschedule(key, next_due)
+
+    async def run(self) -> None:
+        tasks = [asyncio.create_task(self._dispatch())]
+        tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
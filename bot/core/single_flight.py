@@ -0,0 +1,35 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """Concurrent calls for the same key share one in-flight call.
+
+    The first caller runs `call`, the others wait on its outcome (result or exception)
+    without being able to cancel it for everyone.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable]):
+        inflight = self._inflight.get(key)
+        if inflight:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await call()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark as retrieved so a failed flight with no waiters doesn't log "never retrieved"
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import sqlite3
+import threading
+from time import time
+
+from bot.utils import logger
+
+STATE_DB_PATH = 'sessions/state.db'
+
+
+class StateStore:
+    """Per-account schedule, last results and proxy binding in SQLite (WAL), so a restart resumes from what is due.
+
+    Writes run in a worker thread to keep the event loop free.
+    """
+
+    def __init__(self, path: str = STATE_DB_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS account_state ("
+                "session_name TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS proxy_binding (session_name TEXT PRIMARY KEY, proxy TEXT NOT NULL)"
+            )
+        return self._conn
+
+    def load(self, session_name: str) -> dict:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT state FROM account_state WHERE session_name = ?", (session_name,)
+            ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def load_all(self) -> dict[str, dict]:
+        with self._lock:
+            rows = self._connection().execute("SELECT session_name, state FROM account_state").fetchall()
+
+        states = {}
+        for session_name, state in rows:
+            try:
+                states[session_name] = json.loads(state)
+            except json.JSONDecodeError:
+                logger.warning(f"{session_name} | Ignoring unreadable saved state")
+        return states
+
+    def _save(self, session_name: str, state: str) -> None:
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO account_state (session_name, state, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_name) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                (session_name, state, time())
+            )
+
+    async def save(self, session_name: str, state: dict) -> None:
+        try:
+            await asyncio.to_thread(self._save, session_name, json.dumps(state))
+        except sqlite3.Error as error:
+            logger.error(f"{session_name} | Failed to save state: {error}")
+
+    def delete(self, session_name: str) -> None:
+        with self._lock:
+            self._connection().execute("DELETE FROM account_state WHERE session_name = ?", (session_name,))
+
+    def load_proxy_bindings(self) -> dict[str, str]:
+        with self._lock:
+            rows = self._connection().execute("SELECT session_name, proxy FROM proxy_binding").fetchall()
+        return dict(rows)
+
+    def save_proxy_bindings(self, bindings: dict[str, str]) -> None:
+        # Bindings of removed sessions are kept, a session that comes back gets its proxy again
+        with self._lock:
+            connection = self._connection()
+            # One transaction for all of them (the first start binds every session at once), rolled back on errors
+            with connection:
+                connection.execute("BEGIN")
+                connection.executemany(
+                    "INSERT INTO proxy_binding (session_name, proxy) VALUES (?, ?) "
+                    "ON CONFLICT(session_name) DO UPDATE SET proxy = excluded.proxy",
+                    bindings.items()
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+state_store = StateStore()
@@ -1,99 +1,113 @@
 import asyncio
 from datetime import datetime, timedelta
-import json
-import os,sys
+import sys
 from random import randint, choices,random
-from time import time
+from time import time, perf_counter
 from urllib.parse import unquote, quote
 
 import aiohttp
-import pytz
-from aiohttp_proxy import ProxyConnector
-from better_proxy import Proxy
-from pyrogram import Client
-from pyrogram.errors import Unauthorized, UserDeactivated, AuthKeyUnregistered, FloodWait
-from pyrogram.raw.functions.messages import RequestAppWebView
-from pyrogram.raw.types import InputBotAppShortName
-
-from typing import Callable
+from yarl import URL
+
+from typing import Callable, TYPE_CHECKING
 import functools
-from tzlocal import get_localzone
 from bot.config import settings
-from bot.exceptions import InvalidSession
+from bot.exceptions import InvalidSession, RequestError
 from bot.utils import logger
+from bot.utils.logger import session_logging
+from bot.utils.fast_json import decode, DECODE_ERRORS
 from .agents import generate_random_user_agent
-from .headers import headers
-from .api_check import check_base_url
+from .http_pool import session_pool
+from .auth_cache import auth_cache, token_expiry, init_data_expiry
+from .tg_pool import tg_manager, flood_control, LazyClient
+from .state_store import state_store
+from .task_catalog import task_catalog
+from .jobs import JOBS, JOBS_BY_NAME
+from .api_check import api_checker
+from .puzzle import puzzle_resolver
+from .limiter import rate_limiter
+from .response_cache import ResponseCache
+from .traffic import traffic, recorded_web_data
+from .accounts import accounts
+from .retry import retry_policy, classify_exception, classify_response, PAYLOAD, UNAUTHORIZED
+from .models import Balance, Farm, Task, Combo, RankData, RaffleResult
+from .metrics import (REQUEST_DURATION, PROXY_REQUEST_DURATION, REQUESTS, REQUEST_ERRORS,
+                      REQUESTS_IN_FLIGHT, CYCLE_DURATION, ACCOUNT_CYCLE_DURATION, ACCOUNT_NEXT_DUE)
+
+if TYPE_CHECKING:
+    from pyrogram import Client
 
 def error_handler(func: Callable):
     @functools.wraps(func)
     async def wrapper(*args, **kwargs):
         try:
             return await func(*args, **kwargs)
+        except RequestError:
+            # Classified failures are for the retry policy and the scheduler to act on
+            raise
         except Exception as e:
-            await asyncio.sleep(1)
+            logger.debug(f"{func.__name__} failed: {e}")
     return wrapper
 
-def convert_to_local_and_unix(iso_time):
-    dt = datetime.fromisoformat(iso_time.replace('Z', '+00:00'))
-    local_dt = dt.astimezone(get_localzone())
-    unix_time = int(local_dt.timestamp())
-    return unix_time
-
 def next_daily_check():
     current_time = datetime.now()
     next_day = current_time + timedelta(days=1)
     return next_day
 
 class Tapper:
-    def __init__(self, tg_client: Client, proxy: str | None):
+    def __init__(self, tg_client: 'Client | LazyClient', proxy: str | None):
         self.session_name = tg_client.name
         self.tg_client = tg_client
+        self.set_proxy(proxy)
+        self.user_agent = generate_random_user_agent(device_type='android', browser_type='chrome') if settings.FAKE_USERAGENT else None
+
+        self._auth_lock = asyncio.Lock()
+        self.ref_id = None
+        self.init_data = None
+        self.init_data_expiration = 0
+        self.access_token = None
+        self.token_expiration = 0
+        self.load_cached_auth()
+        self.end_farming_dt = 0
+        self.next_check_time = None
+        self.next_combo_check = 0
+        self.last_results = {}
+        self.task_status = {}
+        self.response_cache = ResponseCache(settings.RESPONSE_CACHE_TTLS)
+        self.job_due = {}
+        self.failures = {}
+        self.play_passes = None
+        self.balance_at = 0
+        self.bot_peer = None
+
+    def set_proxy(self, proxy: str | None) -> None:
+        # Takes effect from the next cycle, a Telegram client still connected keeps its proxy until it is released
         self.proxy = proxy
+        self.proxy_label = URL(proxy).with_user(None).human_repr() if proxy else 'direct'
+        self.proxy_checked = False
 
+    @recorded_web_data
     async def get_tg_web_data(self) -> str:
-        
-        if self.proxy:
-            proxy = Proxy.from_str(self.proxy)
-            proxy_dict = dict(
-                scheme=proxy.protocol,
-                hostname=proxy.host,
-                port=proxy.port,
-                username=proxy.login,
-                password=proxy.password
-            )
-        else:
-            proxy_dict = None
-
-        self.tg_client.proxy = proxy_dict
+        # pyrogram is only imported once a session actually needs Telegram
+        from pyrogram.raw.functions.messages import RequestAppWebView
+        from pyrogram.raw.types import InputBotAppShortName, InputPeerUser
 
         try:
-            if not self.tg_client.is_connected:
-                try:
-                    await self.tg_client.connect()
-
-                except (Unauthorized, UserDeactivated, AuthKeyUnregistered):
-                    raise InvalidSession(self.session_name)
-            
-            while True:
-                try:
-                    peer = await self.tg_client.resolve_peer('Tomarket_ai_bot')
-                    break
-                except FloodWait as fl:
-                    fls = fl.value
-
-                    logger.warning(f"{self.session_name} | FloodWait {fl}")
-                    logger.info(f"{self.session_name} | Sleep {fls}s")
-                    await asyncio.sleep(fls + 10)
-            
-            ref_id = choices([settings.REF_ID, "0001b3Lf"], weights=[70, 30], k=1)[0] # change this to weights=[100, 0] if you don't want to support me
-            web_view = await self.tg_client.invoke(RequestAppWebView(
-                peer=peer,
-                app=InputBotAppShortName(bot_id=peer, short_name="app"),
-                platform='android',
-                write_allowed=True,
-                start_param=ref_id
-            ))
+            async with tg_manager.borrow(self.tg_client, self.proxy) as tg_client:
+                if self.bot_peer is None:
+                    # The bot's access hash stays valid for this account, resolving it again costs a call
+                    peer = await flood_control.call(tg_client, 'resolve_peer',
+                                                    lambda: tg_client.resolve_peer('Tomarket_ai_bot'))
+                    self.bot_peer = {'user_id': peer.user_id, 'access_hash': peer.access_hash}
+                peer = InputPeerUser(**self.bot_peer)
+
+                ref_id = choices([settings.REF_ID, "0001b3Lf"], weights=[70, 30], k=1)[0] # change this to weights=[100, 0] if you don't want to support me
+                web_view = await flood_control.call(tg_client, 'request_app_web_view', lambda: tg_client.invoke(RequestAppWebView(
+                    peer=peer,
+                    app=InputBotAppShortName(bot_id=peer, short_name="app"),
+                    platform='android',
+                    write_allowed=True,
+                    start_param=ref_id
+                )))
 
             auth_url = web_view.url
             tg_web_data = unquote(
@@ -107,23 +121,98 @@ class Tapper:
             hash_value = tg_web_data_parts[5].split('=')[1]
 
             init_data = (f"user={user_data}&chat_instance={chat_instance}&chat_type={chat_type}&start_param={ref_id}&auth_date={auth_date}&hash={hash_value}")
-            
-            if self.tg_client.is_connected:
-                await self.tg_client.disconnect()
 
             return ref_id, init_data
 
+        except RequestError:
+            raise
         except Exception as error:
+            # A stale peer fails the same way as anything else, resolve it afresh next time
+            self.bot_peer = None
             logger.error(f"{self.session_name} | Unknown error: {error}")
             await asyncio.sleep(delay=3)
             return None, None
 
+    def request_headers(self) -> dict:
+        request_headers = {}
+        if self.user_agent:
+            request_headers['User-Agent'] = self.user_agent
+        if self.access_token:
+            request_headers['Authorization'] = f"{self.access_token}"
+        return request_headers
+
+    async def send_request(self, http_client, method, endpoint, **kwargs):
+        await rate_limiter.acquire(endpoint)
+        REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+        start = perf_counter()
+        try:
+            status, headers, body = await traffic.send(self.session_name, http_client, method,
+                                                       f"{settings.API_BASE_URL}{endpoint or ''}", endpoint, **kwargs)
+        except Exception as error:
+            request_error = classify_exception(endpoint, error)
+            REQUESTS.inc(endpoint=endpoint, status='error')
+            REQUEST_ERRORS.inc(endpoint=endpoint, kind=request_error.kind if request_error else type(error).__name__)
+            if request_error is None:
+                raise
+            raise request_error from error
+        finally:
+            elapsed = perf_counter() - start
+            REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+            REQUEST_DURATION.observe(elapsed, endpoint=endpoint)
+            PROXY_REQUEST_DURATION.observe(elapsed, proxy=self.proxy_label)
+        REQUESTS.inc(endpoint=endpoint, status=status)
+
+        try:
+            data = decode(body)
+        except DECODE_ERRORS:
+            data = None
+        rate_limiter.feedback(endpoint, status, data)
+
+        error = classify_response(endpoint, status, headers, data)
+        if error is None and data is None and body.strip():
+            error = RequestError(endpoint, PAYLOAD, f"invalid JSON (HTTP {status})")
+        if error is not None:
+            REQUEST_ERRORS.inc(endpoint=endpoint, kind=error.kind)
+            raise error
+        return data
+
+    async def send_with_retry(self, http_client, method, endpoint, **kwargs):
+        headers = kwargs.pop('headers', {})
+        # Headers are rebuilt per attempt so a retry after re-login carries the new token
+        send = lambda: self.send_request(http_client, method, endpoint, headers={**self.request_headers(), **headers}, **kwargs)
+
+        if self.response_cache.cacheable(endpoint):
+            return await self.response_cache.get(endpoint, kwargs.get('json'), lambda: retry_policy.call(endpoint, send, self.proxy_label))
+
+        try:
+            return await retry_policy.call(endpoint, send, self.proxy_label)
+        finally:
+            self.response_cache.invalidate(endpoint)
+
     @error_handler
     async def make_request(self, http_client, method, endpoint=None, url=None, **kwargs):
-        full_url = url or f"https://api-web.tomarket.ai/tomarket-game/v1{endpoint or ''}"
-        response = await http_client.request(method, full_url, **kwargs)
-        return await response.json()
-        
+        if url:
+            # Third-party hosts (e.g. the proxy check) get the account's User-Agent, never its token
+            user_agent = {'User-Agent': self.user_agent} if self.user_agent else {}
+            kwargs['headers'] = {**user_agent, **kwargs.get('headers', {})}
+            _, _, body = await traffic.send(self.session_name, http_client, method, url, url, **kwargs)
+            return decode(body)
+
+        access_token = self.access_token
+        try:
+            return await self.send_with_retry(http_client, method, endpoint, **kwargs)
+        except RequestError as error:
+            if error.kind != UNAUTHORIZED or endpoint == '/user/login':
+                raise
+
+        logger.info(f"{self.session_name} | Access Denied. Re-authenticating...")
+        # Concurrent requests may have been rejected with the same token, only the first one logs in again
+        if self.access_token == access_token:
+            self.invalidate_auth()
+        if not await self.authorize(http_client):
+            raise RequestError(endpoint, UNAUTHORIZED, 'login failed')
+        return await self.send_with_retry(http_client, method, endpoint, **kwargs)
+
     @error_handler
     async def login(self, http_client, tg_web_data: str, ref_id: str) -> tuple[str, str]:
         response = await self.make_request(http_client, "POST", "/user/login", json={"init_data": tg_web_data, "invite_code": ref_id, "from":"","is_bot":False})
@@ -205,65 +294,10 @@ class Tapper:
     
     @error_handler
     async def get_puzzle(self, taskId):
-        urls = [
-            "https://raw.githubusercontent.com/yanpaing007/Tomarket/refs/heads/main/bot/config/combo.json",
-            "https://raw.githubusercontent.com/zuydd/database/refs/heads/main/tomarket.json"
-        ]
-        
-        async with aiohttp.ClientSession() as session:
-            for idx, url in enumerate(urls):
-                repo_type = "main" if idx == 0 else "backup"
-                try:
-                    async with session.get(url) as response:
-                        if response.status == 200:
-                            try:
-                                text = await response.text()
-                                data = json.loads(text)
-                                puzzle = data.get('puzzle', None)
-                                code = puzzle.get('code') if puzzle else data.get('code', None)
-                                
-                                if puzzle and puzzle.get('task_id') == taskId:
-                                    logger.info(f"{self.session_name} - Puzzle retrieved successfully from {repo_type} repo: {puzzle}")
-                                    return code
-                                elif repo_type == "backup":
-                                    logger.info(f"{self.session_name} - Puzzle not found even in backup repo,trying from local combo.json...")
-                                    get_local = self.get_local_puzzle(taskId)
-                                    if get_local:
-                                        return get_local
-                                    return None
-                            except json.JSONDecodeError as json_err:
-                                logger.error(f"{self.session_name} - Error parsing JSON from {repo_type} repo: {json_err}")
-                        else:
-                            logger.error(f"{self.session_name} - Failed to retrieve puzzle from {repo_type} repo. Status code: {response.status}")
-                except aiohttp.ClientError as e:
-                    logger.error(f"{self.session_name} - Exception occurred while retrieving puzzle from {repo_type} repo: {e}")
-        
-        logger.info(f"{self.session_name} - Failed to retrieve puzzle from both main and backup repos.")
-        return None
-    
-    def get_local_puzzle(self,taskId):
-        try:
-            with open('bot/config/combo.json', 'r') as local_file:
-                data = json.load(local_file)
-                puzzle = data.get('puzzle', None)
-                code = puzzle.get('code') if puzzle else None
-
-                if puzzle and puzzle.get('task_id') == taskId:
-                    logger.info(f"{self.session_name} - Puzzle retrieved successfully from local file: {puzzle}")
-                    return code
-                else:
-                    logger.info(f"{self.session_name} - Puzzle with {taskId} not found in local file.Please change the task_id and code in combo.json if you knew the code.")
-                    return None
-
-        except FileNotFoundError:
-            logger.error(f"{self.session_name} - Local file combo.json not found.")
-        except json.JSONDecodeError as json_err:
-            logger.error(f"{self.session_name} - Error parsing JSON from local file: {json_err}")
-
-        logger.info(f"{self.session_name} - Failed to retrieve puzzle from both main and backup repos, and local file.")
-        return None
-    
-    
+        code = await puzzle_resolver.resolve(taskId)
+        if code is None:
+            logger.info(f"{self.session_name} - Failed to retrieve puzzle from both main and backup repos, and local file.")
+        return code
 
     @error_handler
     async def create_rank(self, http_client):
@@ -283,473 +317,532 @@ class Tapper:
     
     @error_handler
     async def name_change(self, emoji: str) -> bool:
-        # await asyncio.sleep(random.randint(3, 5))
-        if self.proxy:
-            proxy = Proxy.from_str(self.proxy)
-            proxy_dict = dict(
-                scheme=proxy.protocol,
-                hostname=proxy.host,
-                port=proxy.port,
-                username=proxy.login,
-                password=proxy.password
-            )
-        else:
-            proxy_dict = None
+        async with tg_manager.borrow(self.tg_client, self.proxy) as tg_client:
+            try:
+                user = await flood_control.call(tg_client, 'get_me', tg_client.get_me)
 
-        self.tg_client.proxy = proxy_dict
+                current_name = user.first_name
+                logger.info(f"{self.session_name} | Current Name: <y>{current_name}</y>")
 
-        if not self.tg_client.is_connected:
+                new_name = current_name + emoji if emoji not in current_name else current_name
+
+                if current_name != new_name:
+                    try:
+                        await flood_control.call(tg_client, 'update_profile',
+                                                 lambda: tg_client.update_profile(first_name=new_name))
+                        logger.info(f"{self.session_name} | Name changed to: <y>{new_name}</y>")
+                        return True
+                    except Exception as e:
+                        logger.error(f"{self.session_name} | Error updating {new_name}: {str(e)}")
+                        return False
+                else:
+                    logger.info(f"{self.session_name} | Name already contains the emoji.")
+                    return False
+
+            except Exception as e:
+                logger.error(f"{self.session_name} | Error during name change: {str(e)}")
+                return False
+
+    async def complete_task(self, http_client, task: Task, semaphore: asyncio.Semaphore) -> None:
+        # The semaphore bounds concurrent requests, waiting for a task timer doesn't hold a slot
+        claim = None
+
+        if task.type == 'emoji': # Emoji task
+            logger.info(f"{self.session_name} | Start task <light-red>{task.name}.</light-red> Wait {30}s 🍅")
+            await asyncio.sleep(30)
+            async with semaphore:
+                await self.name_change(emoji='🍅')
+
+                await self.start_task(http_client=http_client, data={'task_id': task.task_id,'init_data':self.init_data})
+                check = await self.check_task(http_client=http_client, data={'task_id': task.task_id, 'init_data': self.init_data})
+                if check:
+                    logger.info(f"{self.session_name} | Task <light-red>{task.name}</light-red> checked! 🍅")
+                    claim = await self.claim_task(http_client=http_client, data={'task_id': task.task_id})
+        else:
+            async with semaphore:
+                starttask = await self.start_task(http_client=http_client, data={'task_id': task.task_id,'init_data':self.init_data})
+            task_data = starttask.get('data', {}) if starttask else None
+            if not (task_data == 'ok' or task_data.get('status') == 1 or task_data.get('status') ==2 if task_data else False):
+                return
+
+            logger.info(f"{self.session_name} | Start task <light-red>{task.name}.</light-red> Wait {task.wait_second}s 🍅")
+            await asyncio.sleep(task.wait_second + 3)
+            async with semaphore:
+                await self.check_task(http_client=http_client, data={'task_id': task.task_id,'init_data':self.init_data})
+                claim = await self.claim_task(http_client=http_client, data={'task_id': task.task_id})
+
+        if claim:
+            if claim['status'] == 0:
+                logger.success(f"{self.session_name} | Task <light-red>{task.name}</light-red> claimed! Reward: {task.score} 🍅")
+            else:
+                logger.info(f"{self.session_name} | Task <light-red>{task.name}</light-red> not claimed. Reason: {claim.get('message', 'Unknown error')}")
+
+    async def complete_tasks(self, http_client, tasks_list: list[Task]) -> None:
+        """Start every task, then check and claim each one when its own timer fires."""
+        semaphore = asyncio.Semaphore(settings.TASK_CONCURRENCY)
+        tasks = {task.task_id: task for task in tasks_list}.values()
+        results = await asyncio.gather(*(self.complete_task(http_client, task, semaphore) for task in tasks), return_exceptions=True)
+        for task, result in zip(tasks, results):
+            if isinstance(result, Exception):
+                logger.error(f"{self.session_name} | Error while completing task <light-red>{task.name}</light-red>: {result}")
+
+    async def process_combo(self, http_client) -> None:
+        combo_info = await self.get_combo(http_client, data={"language_code": "en", "init_data": self.init_data})
+
+        if combo_info is None or not isinstance(combo_info, dict):
+            logger.error(f"{self.session_name} | Failed to retrieve combo info | Response: {combo_info}")
+            return
+
+        combo_info_data = (combo_info.get('data') or [None])[0]
+        if not isinstance(combo_info_data, dict):
+            logger.error(f"{self.session_name} | Combo info data is missing or invalid!")
+            return
+
+        combo = Combo.from_data(combo_info_data)
+        end_time = combo.end_time
+        status = combo.status
+        task_id = combo.task_id
+
+        if combo_info.get('status') == 0:
+            if status > 0:
+                logger.info(f"{self.session_name} | Daily Combo already claimed.")
                 try:
-                    logger.info(f"{self.session_name} | Sleeping 5 seconds before connecting tg_client...")
-                    await asyncio.sleep(5)
-                    await self.tg_client.connect()
+                    self.next_combo_check = int(datetime.fromisoformat(end_time).timestamp())
+                    logger.info(f"{self.session_name} | Next combo check in <light-red>{round((self.next_combo_check - time()) / 60)}m.</light-red>")
+                except ValueError as ve:
+                    logger.error(f"{self.session_name} | Error parsing combo end time: {end_time} | Exception: {ve}")
 
-                except (Unauthorized, UserDeactivated, AuthKeyUnregistered):
-                    raise InvalidSession(self.session_name)
+            try:
+                combo_end_time = datetime.fromisoformat(end_time)
+                if status == 0 and combo_end_time > datetime.now():
+                    payload =await self.get_puzzle(task_id)
+                    if payload is None:
+                        logger.warning(f"{self.session_name} | Failed to retrieve puzzle payload,puzzle might expire! Raise an issue on the GitHub repository.")
+                    else:
 
-        try:
-            user = await self.tg_client.get_me()
-            
-            current_name = user.first_name
-            logger.info(f"{self.session_name} | Current Name: <y>{current_name}</y>")
-            
-            new_name = current_name + emoji if emoji not in current_name else current_name
-            
-            if current_name != new_name:
+                        combo_json = {"task_id": task_id, "code": payload}
+
+                        claim_combo = await self.claim_combo(http_client, data=combo_json)
+                        if (claim_combo is not None and 
+                            claim_combo.get('status') == 0 and 
+                            claim_combo.get('message') == '' and 
+                            isinstance(claim_combo.get('data'), dict) and 
+                            not claim_combo['data']):
+
+                            logger.success(
+                                f"{self.session_name} | Claimed combo | Stars: +{combo.star} ⭐ | Games Token: +{combo.games} 🎟️ | Tomatoes: +{combo.score} 🍅"
+                            )
+
+                            self.next_combo_check = int(combo_end_time.timestamp())
+                            self.trigger('game', 'rank')
+                            logger.info(f"{self.session_name} | Next combo check in <light-red>{round((self.next_combo_check - time()) / 60)}m.</light-red>")
+                        else:
+                            logger.info(f"{self.session_name} | Combo not claimed. Reason: <light-red>{claim_combo.get('message', 'Unknown error')}</light-red>")
+
+            except ValueError as ve:
+                logger.error(f"{self.session_name} | Error parsing combo end time: {end_time} | Exception: {ve}")
+            except Exception as e:
+                logger.error(f"{self.session_name} | An error occurred while processing the combo: {e}")
+
+    def get_state(self) -> dict:
+        return {
+            'end_farming_dt': self.end_farming_dt,
+            'next_check_time': self.next_check_time.timestamp() if self.next_check_time else None,
+            'next_combo_check': self.next_combo_check,
+            'job_due': self.job_due,
+            'last_results': self.last_results,
+            'bot_peer': self.bot_peer,
+        }
+
+    def restore_state(self, state: dict) -> None:
+        self.end_farming_dt = state.get('end_farming_dt', 0)
+        next_check_time = state.get('next_check_time')
+        self.next_check_time = datetime.fromtimestamp(next_check_time) if next_check_time else None
+        self.next_combo_check = state.get('next_combo_check', 0)
+        self.job_due = state.get('job_due') or {
+            'farm': self.end_farming_dt,
+            'daily': next_check_time or 0,
+            'combo': self.next_combo_check,
+        }
+        self.last_results = state.get('last_results', {})
+        self.bot_peer = state.get('bot_peer')
+
+    def trigger(self, *job_names: str) -> None:
+        # Something changed that a job depends on (e.g. new game passes), run it on this cycle
+        for job_name in job_names:
+            self.job_due[job_name] = 0
+
+    def job_enabled(self, job) -> bool:
+        # Per account overrides from bot/config/accounts.json win over the AUTO_* settings
+        account = accounts.get(self.session_name)
+        return account.job_enabled(job) if account else job.enabled
+
+    def next_due(self, min_delay: float = 60) -> float:
+        deadlines = [self.job_due.get(job.name, 0) for job in JOBS if self.job_enabled(job)]
+        # Never come back right away, e.g. when farming could not be started
+        return max(min(deadlines, default=time() + 3600), time() + min_delay)
+
+    def start_delay(self) -> int:
+        if not settings.USE_RANDOM_DELAY_IN_RUN:
+            return 0
+        random_delay = randint(settings.RANDOM_DELAY_IN_RUN[0], settings.RANDOM_DELAY_IN_RUN[1])
+        logger.info(f"{self.session_name} | Bot will start in <light-red>{random_delay}s</light-red>")
+        return random_delay
+
+    def load_cached_auth(self) -> None:
+        cached_auth = auth_cache.get(self.session_name)
+        if cached_auth:
+            self.ref_id = cached_auth['ref_id']
+            self.init_data = cached_auth['init_data']
+            self.init_data_expiration = cached_auth['init_data_expires_at']
+            self.access_token = cached_auth['access_token']
+            self.token_expiration = cached_auth['expires_at']
+
+    def invalidate_auth(self) -> None:
+        auth_cache.invalidate(self.session_name)
+        self.response_cache.clear()
+        self.init_data = None
+        self.init_data_expiration = 0
+        self.access_token = None
+        self.token_expiration = 0
+
+    async def authorize(self, http_client, min_valid: float = 0) -> bool:
+        async with self._auth_lock:
+            # Another job may have logged in while we were waiting for the lock
+            if self.access_token and self.token_expiration > time() + min_valid:
+                return True
+
+            access_token = None
+            if self.init_data and self.init_data_expiration > time():
                 try:
-                    await self.tg_client.update_profile(first_name=new_name)
-                    logger.info(f"{self.session_name} | Name changed to: <y>{new_name}</y>")
-                    return True  
-                except Exception as e:
-                    logger.error(f"{self.session_name} | Error updating {new_name}: {str(e)}")
-                    await asyncio.sleep(5)
-                    return False
-            else:
-                logger.info(f"{self.session_name} | Name already contains the emoji.")
+                    access_token = await self.login(http_client=http_client, tg_web_data=self.init_data, ref_id=self.ref_id)
+                except RequestError as error:
+                    # Rejected init data is replaced with fresh web data below
+                    if error.kind != UNAUTHORIZED:
+                        raise
+            if not access_token:
+                self.ref_id, self.init_data = await self.get_tg_web_data()
+                access_token = await self.login(http_client=http_client, tg_web_data=self.init_data, ref_id=self.ref_id)
+
+            if not access_token:
+                logger.error(f"{self.session_name} | <light-red>Failed login</light-red>")
+                self.invalidate_auth()
                 return False
 
-        except Exception as e:
-            logger.error(f"{self.session_name} | Error during name change: {str(e)}")
-            return False
+            logger.info(f"{self.session_name} | <green>🍅 Login successful</green>")
+            self.access_token = access_token
+            self.token_expiration = token_expiry(access_token, settings.AUTH_TOKEN_TTL)
+            self.init_data_expiration = init_data_expiry(self.init_data, settings.INIT_DATA_TTL)
+            auth_cache.put(self.session_name, self.ref_id, self.init_data, self.access_token, self.token_expiration)
+            return True
 
-        finally:
-            if self.tg_client.is_connected:
-                await asyncio.sleep(5)
-                await self.tg_client.disconnect()
-            await asyncio.sleep(randint(10, 20))
-    
-    async def run(self) -> None:        
-        if settings.USE_RANDOM_DELAY_IN_RUN:
-            random_delay = randint(settings.RANDOM_DELAY_IN_RUN[0], settings.RANDOM_DELAY_IN_RUN[1])
-            logger.info(f"{self.tg_client.name} | Bot will start in <light-red>{random_delay}s</light-red>")
-            await asyncio.sleep(delay=random_delay)
-       
-            
-        proxy_conn = ProxyConnector().from_url(self.proxy) if self.proxy else None
-        http_client = aiohttp.ClientSession(headers=headers, connector=proxy_conn)
-        if self.proxy:
-            await self.check_proxy(http_client=http_client)
-        
-        if settings.FAKE_USERAGENT:            
-            http_client.headers['User-Agent'] = generate_random_user_agent(device_type='android', browser_type='chrome')
-
-
-        end_farming_dt = 0
-        token_expiration = 0
-        tickets = 0
-        next_combo_check = 0
-        next_check_time = None
-        
-        while True:
+    @session_logging
+    async def refresh_auth(self) -> float:
+        """Renew the token shortly before it expires, so cycles never wait on a login."""
+        due = self.token_expiration - settings.AUTH_REFRESH_MARGIN
+        if due > time():
+            return due
+
+        async with session_pool.session(self.proxy) as http_client:
             try:
-                if check_base_url() is False:
-                        sys.exit(
-                            "Detected api change! Stopped the bot for safety. Please raise an issue on the GitHub repository.")
-                if http_client.closed:
-                    if proxy_conn:
-                        if not proxy_conn.closed:
-                            proxy_conn.close()
-
-                    proxy_conn = ProxyConnector().from_url(self.proxy) if self.proxy else None
-                    http_client = aiohttp.ClientSession(headers=headers, connector=proxy_conn)
-                    if settings.FAKE_USERAGENT:            
-                        http_client.headers['User-Agent'] = generate_random_user_agent(device_type='android', browser_type='chrome')
-                current_time = time()
-                if current_time >= token_expiration:
-                    if (token_expiration != 0):
-                        logger.info(f"{self.session_name} | <yellow>Token expired, refreshing...</yellow>")
-                    ref_id, init_data = await self.get_tg_web_data()
-                    access_token = await self.login(http_client=http_client, tg_web_data=init_data, ref_id=ref_id)
-                    
-                if not access_token:
-                    logger.error(f"{self.session_name} | <light-red>Failed login</light-red>")
-                    logger.info(f"{self.session_name} | Sleep <light-red>300s</light-red>")
-                    await asyncio.sleep(delay=300)
+                authorized = await self.authorize(http_client, min_valid=settings.AUTH_REFRESH_MARGIN)
+            except RequestError as error:
+                delay = self.failure_delay('auth', error)
+                logger.info(f"{self.session_name} | Token refresh failed: {error} | Retry in <light-red>{round(delay)}s</light-red>")
+                return time() + delay
+            if not authorized:
+                logger.info(f"{self.session_name} | Token refresh failed, retrying in <light-red>300s</light-red>")
+                return time() + 300
+        self.failures.pop('auth', None)
+        # A token living shorter than the margin is renewed at half its lifetime, not in a loop
+        now = time()
+        lifetime = self.token_expiration - now
+        return max(self.token_expiration - settings.AUTH_REFRESH_MARGIN,
+                   now + max(60, min(settings.AUTH_REFRESH_MARGIN, lifetime / 2)))
+
+    def failure_delay(self, name: str, error: RequestError) -> float:
+        """Backoff for a job (or login) that failed with `error`, growing with consecutive failures."""
+        failures = self.failures.get(name, 0)
+        self.failures[name] = failures + 1
+        return retry_policy.job_delay(error, failures)
+
+    async def get_checked_balance(self, http_client) -> Balance | None:
+        balance = await self.get_balance(http_client=http_client)
+        if balance and isinstance(balance.get('data'), dict):
+            balance = Balance.from_data(balance['data'])
+            self.play_passes = balance.play_passes
+            self.balance_at = time()
+            return balance
+
+        logger.error(f"{self.session_name} | Balance response missing 'data' key: {balance}")
+        return None
+
+    async def job_farm(self, http_client) -> float:
+        balance = await self.get_checked_balance(http_client)
+        if balance is None:
+            return time() + 300
+
+        logger.info(f"{self.session_name} | Current balance | <light-red>{balance.available_balance} 🍅</light-red>")
+        self.last_results['balance'] = balance.available_balance
+        ramdom_end_time = randint(350, 500)
+        if balance.farm_end_at is not None and balance.farm_end_at > time():
+            self.end_farming_dt = balance.farm_end_at + ramdom_end_time
+            logger.info(f"{self.session_name} | Farming in progress, next claim in <light-red>{round((self.end_farming_dt - time()) / 60)}m.</light-red>")
+
+        if time() > self.end_farming_dt:
+            claim_farming = await self.claim_farming(http_client=http_client)
+            if claim_farming and 'status' in claim_farming:
+                if claim_farming.get('status') == 500:
+                    start_farming = await self.start_farming(http_client=http_client)
+                    if start_farming and 'status' in start_farming and start_farming['status'] in [0, 200]:
+                        logger.success(f"{self.session_name} | Farm started.. 🍅")
+                        self.end_farming_dt = Farm.from_data(start_farming['data']).end_at + ramdom_end_time
+                        logger.info(f"{self.session_name} | Next farming claim in <light-red>{round((self.end_farming_dt - time()) / 60)}m.</light-red>")
+                elif claim_farming.get('status') == 0:
+                    farm_points = Farm.from_data(claim_farming['data']).claim_this_time
+                    logger.success(f"{self.session_name} | Success claim farm. Reward: <light-red>+{farm_points}</light-red> 🍅")
+                    self.last_results['farm_claim'] = farm_points
+                    start_farming = await self.start_farming(http_client=http_client)
+                    if start_farming and 'status' in start_farming and start_farming['status'] in [0, 200]:
+                        logger.success(f"{self.session_name} | Farm started.. 🍅")
+                        self.end_farming_dt = Farm.from_data(start_farming['data']).end_at + ramdom_end_time
+                        logger.info(f"{self.session_name} | Next farming claim in <light-red>{round((self.end_farming_dt - time()) / 60)}m.</light-red>")
+
+        return self.end_farming_dt
+
+    async def job_daily(self, http_client) -> float:
+        claim_daily = await self.claim_daily(http_client=http_client)
+        if claim_daily and 'status' in claim_daily and claim_daily.get("status", 400) != 400:
+            logger.success(f"{self.session_name} | Daily: <light-red>{claim_daily['data']['today_game']}</light-red> reward: <light-red>{claim_daily['data']['today_points']}</light-red>")
+            self.last_results['daily'] = claim_daily['data']['today_points']
+            self.trigger('game')
+        self.next_check_time = next_daily_check()
+        logger.info(f"{self.session_name} | Next daily check in <light-red>{self.next_check_time}</light-red>")
+        return self.next_check_time.timestamp()
+
+    async def job_combo(self, http_client) -> float:
+        await self.process_combo(http_client)
+        if self.next_combo_check > time():
+            return self.next_combo_check
+        return time() + JOBS_BY_NAME['combo'].interval
+
+    async def job_game(self, http_client) -> float:
+        next_due = time() + JOBS_BY_NAME['game'].interval
+        # Reuse the passes from a balance fetched moments ago by the farm job
+        if self.play_passes is None or time() - self.balance_at > 60:
+            if await self.get_checked_balance(http_client) is None:
+                return time() + 300
+        tickets = self.play_passes
+        logger.info(f"{self.session_name} | Game Play Tickets: {tickets} 🎟️")
+
+        if tickets > 0:
+            logger.info(f"{self.session_name} | Start ticket games...")
+            games_points = 0
+            retry_count = 0
+            max_retries = 5
+            if settings.PLAY_RANDOM_GAME:
+                if  tickets > settings.PLAY_RANDOM_GAME_COUNT[1]:
+                    tickets = randint(settings.PLAY_RANDOM_GAME_COUNT[0], settings.PLAY_RANDOM_GAME_COUNT[1])
+                    logger.info(f"{self.session_name} | Playing with: {tickets} 🎟️ this round")
+
+            while tickets > 0:
+                logger.info(f"{self.session_name} | Tickets remaining: {tickets} 🎟️")
+                play_game = await self.play_game(http_client=http_client)
+                if not play_game or play_game.get('status', 500) != 0:
+                    logger.warning(f"{self.session_name} | Game not started: {(play_game or {}).get('message', 'no response')}")
+                    # The pass count may be stale, read it from the balance again next time
+                    self.play_passes = None
+                    break
+                await asyncio.sleep(30)
+
+                claim_game = await self.claim_game(http_client=http_client, points=randint(settings.POINTS_COUNT[0], settings.POINTS_COUNT[1]))
+                if claim_game and claim_game.get('status') == 500 and claim_game.get('message') == 'game not start':
+                    retry_count += 1
+                    if retry_count >= max_retries:
+                        logger.warning(f"{self.session_name} | Max retries reached, stopping game attempts.")
+                        break
+                    logger.info(f"{self.session_name} | Game not started, retrying...")
                     continue
+                if not claim_game or claim_game.get('status', 500) != 0:
+                    logger.warning(f"{self.session_name} | Game not claimed: {(claim_game or {}).get('message', 'no response')}")
+                    break
+
+                tickets -= 1
+                self.play_passes -= 1
+                games_points += claim_game.get('data', {}).get('points', 0)
+                logger.success(f"{self.session_name} | Claimed points: <light-red>+{claim_game.get('data', {}).get('points', 0)} </light-red>🍅")
+
+            logger.info(f"{self.session_name} | Games finished! Claimed points: <light-red>{games_points} 🍅</light-red>")
+            self.last_results['game_points'] = games_points
+
+        return next_due
+
+    async def job_tasks(self, http_client) -> float:
+        logger.info(f"{self.session_name} | Start checking tasks.")
+        tasks = await self.get_tasks(http_client=http_client, data={"language_code":"en", "init_data":self.init_data})
+        tasks_list = []
+
+        if tasks and tasks.get("status", 500) == 0:
+            self.task_status = task_catalog.update(tasks["data"])
+            tasks_list = task_catalog.eligible(self.task_status)
+        if len(tasks_list) == 0:
+            logger.info(f"{self.session_name} | No tasks available.")
+        else:
+            logger.info(f"{self.session_name} | Tasks collected: {len(tasks_list)}")
+            await self.complete_tasks(http_client, tasks_list)
+            # Claimed tasks may have paid out stars
+            self.trigger('rank')
+
+        return time() + JOBS_BY_NAME['tasks'].interval
+
+    async def job_rank(self, http_client) -> float:
+        if await self.create_rank(http_client=http_client):
+            logger.success(f"{self.session_name} | Rank created! 🍅")
+
+        if settings.AUTO_RANK_UPGRADE:
+            rank_data = await self.get_rank_data(http_client=http_client)
+            rank = RankData.from_data((rank_data or {}).get('data') or {})
+            unused_stars = rank.unused_stars
+            current_rank = rank.current_rank
+
+            logger.info(f"{self.session_name} | Unused stars {unused_stars} ⭐")
+            if unused_stars > 0:
+                upgrade_rank = await self.upgrade_rank(http_client=http_client, stars=unused_stars)
+                if upgrade_rank.get('status', 500) == 0:
+                    logger.success(f"{self.session_name} | Rank upgraded! 🍅")
                 else:
-                    logger.info(f"{self.session_name} | <green>🍅 Login successful</green>")
-                    http_client.headers["Authorization"] = f"{access_token}"
-                    token_expiration = time() + 3600
-                await asyncio.sleep(delay=1)
-                
-                balance = await self.get_balance(http_client=http_client)
-                if 'data' not in balance:
-                    if balance.get('status') == 401:
-                        logger.info(f"{self.session_name} | Access Denied. Re-authenticating...")
-                        ref_id, init_data = await self.get_tg_web_data()
-                        access_token = await self.login(http_client=http_client, tg_web_data=init_data, ref_id=ref_id)
-                        if not access_token:
-                            logger.error(f"{self.session_name} | <light-red>Failed login</light-red>")
-                            logger.info(f"{self.session_name} | Sleep <light-red>300s</light-red>")
-                            await asyncio.sleep(300)
-                            continue
-                        else:
-                            logger.info(f"{self.session_name} | <green>🍅 Login successful</green>")
-                            http_client.headers["Authorization"] = f"{access_token}"
-                            token_expiration = time() + 3600
-                            balance = await self.get_balance(http_client=http_client)
-                    else:
-                        logger.error(f"{self.session_name} | Balance response missing 'data' key: {balance}")
-                        continue
-
-                available_balance = balance['data'].get('available_balance', 0)
-                logger.info(f"{self.session_name} | Current balance | <light-red>{available_balance} 🍅</light-red>")
-                ramdom_end_time = randint(350, 500)
-                if 'farming' in balance['data']:
-                    end_farm_time = balance['data']['farming']['end_at']
-                    if end_farm_time > time():
-                        end_farming_dt = end_farm_time + ramdom_end_time
-                        logger.info(f"{self.session_name} | Farming in progress, next claim in <light-red>{round((end_farming_dt - time()) / 60)}m.</light-red>")
-
-                if time() > end_farming_dt:
-                    claim_farming = await self.claim_farming(http_client=http_client)
-                    if claim_farming and 'status' in claim_farming:
-                        if claim_farming.get('status') == 500:
-                            start_farming = await self.start_farming(http_client=http_client)
-                            if start_farming and 'status' in start_farming and start_farming['status'] in [0, 200]:
-                                logger.success(f"{self.session_name} | Farm started.. 🍅")
-                                end_farming_dt = start_farming['data']['end_at'] + ramdom_end_time
-                                logger.info(f"{self.session_name} | Next farming claim in <light-red>{round((end_farming_dt - time()) / 60)}m.</light-red>")
-                        elif claim_farming.get('status') == 0:
-                            farm_points = claim_farming['data']['claim_this_time']
-                            logger.success(f"{self.session_name} | Success claim farm. Reward: <light-red>+{farm_points}</light-red> 🍅")
-                            start_farming = await self.start_farming(http_client=http_client)
-                            if start_farming and 'status' in start_farming and start_farming['status'] in [0, 200]:
-                                logger.success(f"{self.session_name} | Farm started.. 🍅")
-                                end_farming_dt = start_farming['data']['end_at'] + ramdom_end_time
-                                logger.info(f"{self.session_name} | Next farming claim in <light-red>{round((end_farming_dt - time()) / 60)}m.</light-red>")
-                    await asyncio.sleep(1.5)
-
-
-                if settings.AUTO_DAILY_REWARD and (next_check_time is None or datetime.now() > next_check_time):
-                    claim_daily = await self.claim_daily(http_client=http_client)
-                    if claim_daily and 'status' in claim_daily and claim_daily.get("status", 400) != 400:
-                        logger.success(f"{self.session_name} | Daily: <light-red>{claim_daily['data']['today_game']}</light-red> reward: <light-red>{claim_daily['data']['today_points']}</light-red>")
-                    next_check_time = next_daily_check()
-                    logger.info(f"{self.session_name} | Next daily check in <light-red>{next_check_time}</light-red>")
-
-                await asyncio.sleep(1.5)
-
-                if settings.AUTO_PLAY_GAME:
-                    ticket = await self.get_balance(http_client=http_client)
-                    tickets = ticket.get('data', {}).get('play_passes', 0)
-                    logger.info(f"{self.session_name} | Game Play Tickets: {tickets} 🎟️")
-
-                    await asyncio.sleep(1.5)
-                    if tickets > 0:
-                        logger.info(f"{self.session_name} | Start ticket games...")
-                        games_points = 0
-                        retry_count = 0
-                        max_retries = 5
-                        if settings.PLAY_RANDOM_GAME:
-                            if  tickets > settings.PLAY_RANDOM_GAME_COUNT[1]: 
-                                tickets = randint(settings.PLAY_RANDOM_GAME_COUNT[0], settings.PLAY_RANDOM_GAME_COUNT[1])
-                                logger.info(f"{self.session_name} | Playing with: {tickets} 🎟️ this round")
-                            
-
-                        while tickets > 0:
-                            logger.info(f"{self.session_name} | Tickets remaining: {tickets} 🎟️")
-                            try:
-                                play_game = await self.play_game(http_client=http_client)
-                                if play_game and 'status' in play_game:
-                                    if play_game.get('status') == 0:
-                                        await asyncio.sleep(30)  
-                                        
-                                        claim_game = await self.claim_game(http_client=http_client, points=randint(settings.POINTS_COUNT[0], settings.POINTS_COUNT[1]))
-                                        if claim_game and 'status' in claim_game:
-                                            if claim_game['status'] == 500 and claim_game['message'] == 'game not start':
-                                                retry_count += 1
-                                                if retry_count >= max_retries:
-                                                    logger.warning(f"{self.session_name} | Max retries reached, stopping game attempts.")
-                                                    break
-                                                logger.info(f"{self.session_name} | Game not started, retrying...")
-                                                continue
-
-                                            if claim_game.get('status') == 0:
-                                                tickets -= 1
-                                                games_points += claim_game.get('data', {}).get('points', 0)
-                                                logger.success(f"{self.session_name} | Claimed points: <light-red>+{claim_game.get('data', {}).get('points', 0)} </light-red>🍅")
-                                                await asyncio.sleep(randint(3, 5))
-
-                            except Exception as e:
-                                logger.error(f"{self.session_name} | An error occurred: {e}")
-                                await asyncio.sleep(5)
-
-                        logger.info(f"{self.session_name} | Games finished! Claimed points: <light-red>{games_points} 🍅</light-red>")
-
-                if settings.AUTO_TASK:
-                    logger.info(f"{self.session_name} | Start checking tasks.")
-                    tasks = await self.get_tasks(http_client=http_client, data={"language_code":"en", "init_data":init_data})
-                    tasks_list = []
-
-                    if tasks and tasks.get("status", 500) == 0:
-                        for category, task_group in tasks["data"].items():
-                            if isinstance(task_group, list):
-                                for task in task_group:
-                                    if isinstance(task, dict):  
-                                        if task.get('enable') and not task.get('invisible', False) and task.get('status') != 3:
-                                            if task.get('startTime') and task.get('endTime'):
-                                                task_start = convert_to_local_and_unix(task['startTime'])
-                                                task_end = convert_to_local_and_unix(task['endTime'])
-                                        
-                                                if task_start <= time() <= task_end  and task.get('type') not in ['charge_stars_season2', 'chain_donate_free','daily_donate','new_package','charge_stars_season3']:
-                                                    tasks_list.append(task)
-                                            
-                                            elif task.get('type') not in ['wallet', 'mysterious', 'classmate', 'classmateInvite', 'classmateInviteBack', 'charge_stars_season2','chain_donate_free','daily_donate','charge_stars_season3']:
-                                                tasks_list.append(task)
-                                        if task.get('type') == 'youtube' and task.get('status') != 3:
-                                            tasks_list.append(task)
-                            elif isinstance(task_group, dict):  
-                                for group_name, group_tasks in task_group.items():
-                                    if isinstance(group_tasks, list):
-                                        for task in group_tasks:
-                                            if task.get('enable') or not task.get('invisible', False):
-                    
-                                                tasks_list.append(task)
-                    if len(tasks_list) == 0:
-                        logger.info(f"{self.session_name} | No tasks available.")
-                    else:
-                        logger.info(f"{self.session_name} | Tasks collected: {len(tasks_list)}")
-                    for task in tasks_list:
-                        wait_second = task.get('waitSecond', 0)
-                        claim = None
-                        check = None
-                        
-                        if task.get('type') == 'emoji' and settings.AUTO_TASK: # Emoji task
-                                logger.info(f"{self.session_name} | Start task <light-red>{task['name']}.</light-red> Wait {30}s 🍅")
-                                await asyncio.sleep(30)
-                                await self.name_change(emoji='🍅')
-        
-                                starttask = await self.start_task(http_client=http_client, data={'task_id': task['taskId'],'init_data':init_data})
-                                await asyncio.sleep(3)
-                                check = await self.check_task(http_client=http_client, data={'task_id': task['taskId'], 'init_data': init_data})
-                                await asyncio.sleep(3)
-                                if check:
-                                    logger.info(f"{self.session_name} | Task <light-red>{task['name']}</light-red> checked! 🍅")
-                                    claim = await self.claim_task(http_client=http_client, data={'task_id': task['taskId']})
-                        else:
-                            starttask = await self.start_task(http_client=http_client, data={'task_id': task['taskId'],'init_data':init_data})
-                            task_data = starttask.get('data', {}) if starttask else None
-                            if task_data == 'ok' or task_data.get('status') == 1 or task_data.get('status') ==2 if task_data else False:
-                                logger.info(f"{self.session_name} | Start task <light-red>{task['name']}.</light-red> Wait {wait_second}s 🍅")
-                                await asyncio.sleep(wait_second + 3)
-                                await self.check_task(http_client=http_client, data={'task_id': task['taskId'],'init_data':init_data})
-                                await asyncio.sleep(3)
-                                claim = await self.claim_task(http_client=http_client, data={'task_id': task['taskId']})
-                        if claim:
-                                if claim['status'] == 0:
-                                    reward = task.get('score', 'unknown')
-                                    logger.success(f"{self.session_name} | Task <light-red>{task['name']}</light-red> claimed! Reward: {reward} 🍅")
-                                else:
-                                    logger.info(f"{self.session_name} | Task <light-red>{task['name']}</light-red> not claimed. Reason: {claim.get('message', 'Unknown error')}")
-                        await asyncio.sleep(2)
-
-                await asyncio.sleep(3)
-
-                if await self.create_rank(http_client=http_client):
-                    logger.success(f"{self.session_name} | Rank created! 🍅")
-                
-                if settings.AUTO_RANK_UPGRADE:
-                    rank_data = await self.get_rank_data(http_client=http_client)
-                    unused_stars = rank_data.get('data', {}).get('unusedStars', 0)
-                    current_rank = rank_data.get('data', {}).get('currentRank', "Unknown rank").get('name', "Unknown rank")
-                    
-                    try:
-                        unused_stars = int(float(unused_stars)) 
-                    except ValueError:
-                        unused_stars = 0
-                    logger.info(f"{self.session_name} | Unused stars {unused_stars} ⭐")
-                    if unused_stars > 0:
-                        upgrade_rank = await self.upgrade_rank(http_client=http_client, stars=unused_stars)
-                        if upgrade_rank.get('status', 500) == 0:
-                            logger.success(f"{self.session_name} | Rank upgraded! 🍅")
-                        else:
-                            logger.info(
-                                f"{self.session_name} | Rank not upgraded. Reason: <light-red>{upgrade_rank.get('message', 'Unknown error')}</light-red>")
-                    if current_rank:
-                        logger.info(f"{self.session_name} | Current rank: <cyan>{current_rank}</cyan>")
-                            
-                            
-                            
-                if settings.AUTO_CLAIM_COMBO and next_combo_check < time():
-                    combo_info = await self.get_combo(http_client, data={"language_code": "en", "init_data": init_data})
-
-                    if combo_info is None or not isinstance(combo_info, dict):
-                        logger.error(f"{self.session_name} | Failed to retrieve combo info | Response: {combo_info}")
-                        return
-                    
-                    combo_info_data = combo_info.get('data', [None])[0]
-                    if not combo_info_data:
-                        logger.error(f"{self.session_name} | Combo info data is missing or invalid!")
-                        return
-
-                    start_time = combo_info_data.get('startTime')
-                    end_time = combo_info_data.get('endTime')
-                    status = combo_info_data.get('status')
-                    task_id = combo_info_data.get('taskId')
-                    task_type = combo_info_data.get('type')
-
-                    if combo_info.get('status') == 0 and combo_info_data is not None:
-                        if status > 0:
-                            logger.info(f"{self.session_name} | Daily Combo already claimed.")
-                            try:
-                                next_combo_check = int(datetime.fromisoformat(end_time).timestamp())
-                                logger.info(f"{self.session_name} | Next combo check in <light-red>{round((next_combo_check - time()) / 60)}m.</light-red>")
-                            except ValueError as ve:
-                                logger.error(f"{self.session_name} | Error parsing combo end time: {end_time} | Exception: {ve}")
-
-                        try:
-                            combo_end_time = datetime.fromisoformat(end_time)
-                            if status == 0 and combo_end_time > datetime.now():
-                                star_amount = combo_info_data.get('star')
-                                games_token = combo_info_data.get('games')
-                                tomato_token = combo_info_data.get('score')
-
-                                
-                                payload =await self.get_puzzle(task_id)
-                                if payload is None:
-                                    logger.warning(f"{self.session_name} | Failed to retrieve puzzle payload,puzzle might expire! Raise an issue on the GitHub repository.")
-                                else:
-
-                                    combo_json = {"task_id": task_id, "code": payload}
-                
-                                    claim_combo = await self.claim_combo(http_client, data=combo_json)
-                                    if (claim_combo is not None and 
-                                        claim_combo.get('status') == 0 and 
-                                        claim_combo.get('message') == '' and 
-                                        isinstance(claim_combo.get('data'), dict) and 
-                                        not claim_combo['data']):
-                                        
-                                        logger.success(
-                                            f"{self.session_name} | Claimed combo | Stars: +{star_amount} ⭐ | Games Token: +{games_token} 🎟️ | Tomatoes: +{tomato_token} 🍅"
-                                        )
-
-                                        next_combo_check = int(combo_end_time.timestamp())
-                                        logger.info(f"{self.session_name} | Next combo check in <light-red>{round((next_combo_check - time()) / 60)}m.</light-red>")
-                                    else:
-                                        logger.info(f"{self.session_name} | Combo not claimed. Reason: <light-red>{claim_combo.get('message', 'Unknown error')}</light-red>")
-
-                        except ValueError as ve:
-                            logger.error(f"{self.session_name} | Error parsing combo end time: {end_time} | Exception: {ve}")
-                        except Exception as e:
-                            logger.error(f"{self.session_name} | An error occurred while processing the combo: {e}")
-
-                    await asyncio.sleep(1.5)
-                    
-                    
-                            
-                if settings.AUTO_RAFFLE:
-                    tickets = await self.get_ticket(http_client=http_client, data={"language_code":"en","init_data":init_data})
-                    if tickets and tickets.get('status', 500) == 0:
-                        tickets = tickets.get('data', {}).get('ticket_spin_1', 0)
-                        
-                        if tickets > 0:
-                            logger.info(f"{self.session_name} | Raffle Tickets: <light-red>{tickets} 🎟️</light-red>")
-                            logger.info(f"{self.session_name} | Start ticket raffle...")
-                            while tickets > 0:
-                                play_ticket = await self.play_ticket(http_client=http_client)
-                                if play_ticket and play_ticket.get('status', 500) == 0:
-                                    results = play_ticket.get('data', {}).get('results', [])
-                                    if results:
-                                        raffle_result = results[0]  # Access the first item in the list
-                                        amount = raffle_result.get('amount', 0)
-                                        item_type = raffle_result.get('type', 0)
-                                        logger.success(f"{self.session_name} | Raffle result: {amount} | <light-red>{item_type}</light-red>")
-                                    tickets -= 1
-                                    await asyncio.sleep(5)
-                            logger.info(f"{self.session_name} | Raffle finish! 🍅")
-                        else:
-                            logger.info(f"{self.session_name} | No raffle tickets available!")
-                            
-                if settings.AUTO_ADD_WALLET:
-                    wallet_file_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'wallet.json')
-
-                    with open(wallet_file_path, 'r') as wallet_file:
-                        wallet_data = json.load(wallet_file)
-                        my_address = wallet_data.get(self.session_name, {}).get('address', None)
-                        if not my_address:
-                            logger.warning(f"{self.session_name} | Wallet address not found for {self.session_name} in wallet.json")
-                        else:
+                    logger.info(
+                        f"{self.session_name} | Rank not upgraded. Reason: <light-red>{upgrade_rank.get('message', 'Unknown error')}</light-red>")
+            if current_rank:
+                logger.info(f"{self.session_name} | Current rank: <cyan>{current_rank}</cyan>")
+
+        return time() + JOBS_BY_NAME['rank'].interval
+
+    async def job_raffle(self, http_client) -> float:
+        tickets = await self.get_ticket(http_client=http_client, data={"language_code":"en","init_data":self.init_data})
+        if tickets and tickets.get('status', 500) == 0:
+            tickets = tickets.get('data', {}).get('ticket_spin_1', 0)
+
+            if tickets > 0:
+                logger.info(f"{self.session_name} | Raffle Tickets: <light-red>{tickets} 🎟️</light-red>")
+                logger.info(f"{self.session_name} | Start ticket raffle...")
+                while tickets > 0:
+                    play_ticket = await self.play_ticket(http_client=http_client)
+                    if not play_ticket or play_ticket.get('status', 500) != 0:
+                        break
+                    raffle_result = RaffleResult.from_data(play_ticket.get('data') or {})
+                    if raffle_result:
+                        logger.success(f"{self.session_name} | Raffle result: {raffle_result.amount} | <light-red>{raffle_result.type}</light-red>")
+                    tickets -= 1
+                logger.info(f"{self.session_name} | Raffle finish! 🍅")
+            else:
+                logger.info(f"{self.session_name} | No raffle tickets available!")
+
+        return time() + JOBS_BY_NAME['raffle'].interval
+
+    async def job_wallet(self, http_client) -> float:
+        next_due = time() + JOBS_BY_NAME['wallet'].interval
+        account = accounts.get(self.session_name)
+        my_address = account.wallet if account else None
+        if not my_address:
+            logger.warning(f"{self.session_name} | Wallet address not found for {self.session_name} in wallet.json")
+            return next_due
+
+        tomarket_wallet = await self.make_request(http_client, "POST", "/tasks/walletTask")
+        if not tomarket_wallet or tomarket_wallet.get('status', 500) != 0:
+            logger.error(f"{self.session_name} | Failed to retrieve wallet information from tomarket bot! Status: {(tomarket_wallet or {}).get('status', 'Unknown')}")
+            return next_due
+
+        server_address = tomarket_wallet.get('data', {}).get('walletAddress', None)
+        if server_address == my_address:
+            logger.info(f"{self.session_name} | Current wallet address: <cyan>'{server_address}'</cyan>")
+        elif server_address == '' or server_address is None:
+            logger.info(f"{self.session_name} | Wallet address '{my_address}' not found in tomarket bot! Trying to add...")
+
+            add_wallet = await self.make_request(http_client, "POST", "/tasks/address", json={"wallet_address": my_address})
+            if add_wallet and add_wallet.get('status', 500) == 0:
+                logger.success(f"{self.session_name} | Wallet address '{my_address}' added successfully!")
+            else:
+                logger.error(f"{self.session_name} | Failed to add wallet address.Reason: {(add_wallet or {}).get('message', 'Unknown error')}")
+        else:
+            logger.info(f"{self.session_name} | Wallet address mismatch! Server: '{server_address}' | Your Address: '{my_address}'")
+            logger.info(f"{self.session_name} | Trying to remove wallet address...")
+            remove_wallet = await self.make_request(http_client, "POST", "/tasks/deleteAddress")
+            if remove_wallet and remove_wallet.get('status', 500) == 0 and remove_wallet.get('data',{}) == 'ok':
+                logger.success(f"{self.session_name} | Wallet address removed successfully!")
+                logger.info(f"{self.session_name} | Trying to add wallet address...")
+                add_wallet = await self.make_request(http_client, "POST", "/tasks/address", json={"wallet_address": my_address})
+                if add_wallet and add_wallet.get('status', 500) == 0:
+                    logger.success(f"{self.session_name} | Wallet address '{my_address}' added successfully!")
+                else:
+                    logger.error(f"{self.session_name} | Failed to add wallet address.Reason: {(add_wallet or {}).get('message', 'Unknown error')}")
+            else:
+                logger.error(f"{self.session_name} | Failed to remove wallet address!")
 
-                            tomarket_wallet = await self.make_request(http_client, "POST", "/tasks/walletTask")
-                            if tomarket_wallet and tomarket_wallet.get('status', 500) == 0:
-                                server_address = tomarket_wallet.get('data', {}).get('walletAddress', None)
-                                if server_address == my_address:
-                                    logger.info(f"{self.session_name} | Current wallet address: '{server_address}'!")
-                                if server_address == '':
-                                    logger.info(f"{self.session_name} | Wallet address '{my_address}' not found in tomarket bot! Trying to add...")
-                                    
-                                    add_wallet = await self.make_request(http_client, "POST", "/tasks/address", json={"wallet_address": my_address})
-                                    if add_wallet and add_wallet.get('status', 500) == 0:
-                                        logger.success(f"{self.session_name} | Wallet address '{my_address}' added successfully!")
-                                    else:
-                                        logger.error(f"{self.session_name} | Failed to add wallet address.Reason: {add_wallet.get('message', 'Unknown error')}")
-                                elif server_address != my_address:
-                                    logger.info(f"{self.session_name} | Wallet address mismatch! Server: '{server_address}' | Your Address: '{my_address}'")
-                                    logger.info(f"{self.session_name} | Trying to remove wallet address...")
-                                    remove_wallet = await self.make_request(http_client, "POST", "/tasks/deleteAddress")
-                                    if remove_wallet and remove_wallet.get('status', 500) == 0 and remove_wallet.get('data',{}) == 'ok':
-                                        logger.success(f"{self.session_name} | Wallet address removed successfully!")
-                                        logger.info(f"{self.session_name} | Trying to add wallet address...")
-                                        add_wallet = await self.make_request(http_client, "POST", "/tasks/address", json={"wallet_address": my_address})
-                                        if add_wallet and add_wallet.get('status', 500) == 0:
-                                            logger.success(f"{self.session_name} | Wallet address '{my_address}' added successfully!")
-                                        else:
-                                            logger.error(f"{self.session_name} | Failed to add wallet address.Reason: {add_wallet.get('message', 'Unknown error')}")
-                                    else:
-                                        logger.error(f"{self.session_name} | Failed to remove wallet address!") 
-                            else:
-                                logger.error(f"{self.session_name} | Failed to retrieve wallet information from tomarket bot! Status: {tomarket_wallet.get('status', 'Unknown')}")
-                
-                tomarket_wallet = await self.make_request(http_client, "POST", "/tasks/walletTask")
-                if tomarket_wallet and tomarket_wallet.get('status', 500) == 0:
-                    current_address = tomarket_wallet.get('data', {}).get('walletAddress', None)
-                    if current_address == '' or current_address is None:
-                        logger.info(f"{self.session_name} | Wallet address not found in tomarket bot, add it before OCT 31!")
-                    else:
-                        logger.info(f"{self.session_name} | Current wallet address: <cyan>'{current_address}'</cyan>")
-                        
-
-                sleep_time = end_farming_dt - time()
-                logger.info(f'{self.session_name} | Sleep <light-red>{round(sleep_time / 60, 2)}m.</light-red>')
-                await asyncio.sleep(sleep_time)
-                await http_client.close()
-                if proxy_conn:
-                    if not proxy_conn.closed:
-                        proxy_conn.close()
-            except InvalidSession as error:
-                raise error
-
-            except Exception as error:
-                logger.error(f"{self.session_name} | Unknown error: {error}")
-                await asyncio.sleep(delay=3)
-                logger.info(f'{self.session_name} | Sleep <light-red>10m.</light-red>')
-                await asyncio.sleep(600)
-                
-
-
-async def run_tapper(tg_client: Client, proxy: str | None):
-    try:
-        await Tapper(tg_client=tg_client, proxy=proxy).run()
-    except InvalidSession:
-        logger.error(f"{tg_client.name} | Invalid Session")
+        return next_due
+
+    @session_logging
+    async def run_cycle(self) -> float:
+        """Run the jobs that are due and return the timestamp the account is due again."""
+        if api_checker.api_changed:
+            sys.exit(
+                "Detected api change! Stopped the bot for safety. Please raise an issue on the GitHub repository.")
+
+        if not any(self.job_enabled(job) and self.job_due.get(job.name, 0) <= time() for job in JOBS):
+            return self.next_due()
+
+        start = perf_counter()
+        # The session watcher may rebind the proxy while the cycle runs, give back the pool that was taken
+        proxy = self.proxy
+        http_client = session_pool.acquire(proxy)
+        try:
+            if proxy and not self.proxy_checked:
+                await self.check_proxy(http_client=http_client)
+                self.proxy_checked = True
+
+            if time() >= self.token_expiration:
+                if self.token_expiration != 0:
+                    logger.info(f"{self.session_name} | <yellow>Token expired, refreshing...</yellow>")
+                try:
+                    authorized = await self.authorize(http_client)
+                except RequestError as error:
+                    delay = self.failure_delay('auth', error)
+                    logger.info(f"{self.session_name} | Login failed: {error} | Sleep <light-red>{round(delay)}s</light-red>")
+                    return self.record_cycle(start, time() + delay)
+                if not authorized:
+                    logger.info(f"{self.session_name} | Sleep <light-red>300s</light-red>")
+                    return self.record_cycle(start, time() + 300)
+                self.failures.pop('auth', None)
+
+            for job in JOBS:
+                # Due times are read at each step so a job can trigger a later one on this cycle
+                if not self.job_enabled(job) or self.job_due.get(job.name, 0) > time():
+                    continue
+                try:
+                    self.job_due[job.name] = await getattr(self, f"job_{job.name}")(http_client)
+                    self.failures.pop(job.name, None)
+                except InvalidSession:
+                    raise
+                except RequestError as error:
+                    delay = self.failure_delay(job.name, error)
+                    logger.warning(f"{self.session_name} | {job.name.capitalize()} job failed: {error} | Retry in <light-red>{round(delay)}s</light-red>")
+                    self.job_due[job.name] = time() + delay
+                except Exception as error:
+                    logger.error(f"{self.session_name} | Error in {job.name} job: {error}")
+                    self.job_due[job.name] = time() + 600
+
+            self.last_results['cycle_at'] = time()
+            await state_store.save(self.session_name, self.get_state())
+
+            next_due = self.next_due()
+            logger.info(f'{self.session_name} | Sleep <light-red>{round((next_due - time()) / 60, 2)}m.</light-red>')
+            return self.record_cycle(start, next_due)
+        finally:
+            session_pool.release(proxy)
+
+    def record_cycle(self, start: float, next_due: float) -> float:
+        duration = perf_counter() - start
+        CYCLE_DURATION.observe(duration)
+        ACCOUNT_CYCLE_DURATION.set(duration, session=self.session_name)
+        ACCOUNT_NEXT_DUE.set(max(0.0, next_due - time()), session=self.session_name)
+        return next_due
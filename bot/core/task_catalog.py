@@ -0,0 +1,133 @@
+from bisect import bisect_right
+from datetime import datetime
+from time import time
+
+from bot.config import settings
+from bot.core.models import Task
+from bot.utils import logger
+
+TIMED_EXCLUDED_TYPES = {'charge_stars_season2', 'chain_donate_free', 'daily_donate', 'new_package', 'charge_stars_season3'}
+UNTIMED_EXCLUDED_TYPES = {'wallet', 'mysterious', 'classmate', 'classmateInvite', 'classmateInviteBack', 'charge_stars_season2',
+                          'chain_donate_free', 'daily_donate', 'charge_stars_season3'}
+DONE_STATUS = 3
+
+
+def to_unix(iso_time: str) -> int:
+    return int(datetime.fromisoformat(iso_time.replace('Z', '+00:00')).timestamp())
+
+
+class TaskCatalog:
+    """`/tasks/list` parsed and indexed once per catalog version, shared by every account.
+
+    Accounts keep only an overlay of {taskId: status}; eligibility is then a lookup over
+    the prebuilt indexes instead of a walk over the nested response. The version hashes
+    every task but its per-account `status`, the last `keep` versions stay built so
+    accounts that are shown different tasks don't rebuild on every call.
+    """
+
+    def __init__(self, ttl: int = 3600, keep: int = 8):
+        self.ttl = ttl
+        self.keep = keep
+        self.version = None
+        self._builds = {}
+        self.built_at = 0
+        self.by_id = {}
+        self.by_type = {}
+        self.untimed = []
+        self.grouped = []
+        self.youtube = []
+        self._timed = []
+        self._timed_starts = []
+
+    @staticmethod
+    def _walk(data: dict):
+        for task_group in data.values():
+            if isinstance(task_group, list):
+                for task in task_group:
+                    if isinstance(task, dict) and 'taskId' in task:
+                        yield False, task
+            elif isinstance(task_group, dict):
+                for group_tasks in task_group.values():
+                    if isinstance(group_tasks, list):
+                        for task in group_tasks:
+                            if isinstance(task, dict) and 'taskId' in task:
+                                yield True, task
+
+    def update(self, data: dict) -> dict:
+        """Rebuild the indexes if the catalog changed and return the caller's status overlay."""
+        overlay = {}
+        content = []
+        for in_group, task in self._walk(data):
+            overlay[task['taskId']] = task.get('status')
+            content.append((in_group, tuple(item for item in task.items() if item[0] != 'status')))
+
+        try:
+            version = hash(tuple(content))
+        except TypeError:
+            # A task field holding a list or an object
+            version = hash(repr(content))
+        if version != self.version:
+            build = self._builds.get(version)
+            if build is not None:
+                self._load(version, build)
+        if version != self.version or time() - self.built_at > self.ttl:
+            self._build(data, version)
+        return overlay
+
+    def _build(self, data: dict, version: int) -> None:
+        by_id, by_type = {}, {}
+        untimed, grouped, youtube, timed = [], [], [], []
+
+        for in_group, task in self._walk(data):
+            task = Task.from_data(task)
+            task_id = task.task_id
+            by_id[task_id] = task
+            by_type.setdefault(task.type, []).append(task_id)
+
+            if in_group:
+                if task.enable or not task.invisible:
+                    grouped.append(task_id)
+                continue
+
+            if task.type == 'youtube':
+                youtube.append(task_id)
+            if not task.enable or task.invisible:
+                continue
+            if task.start_time and task.end_time:
+                try:
+                    start, end = to_unix(task.start_time), to_unix(task.end_time)
+                except ValueError:
+                    logger.warning(f"Skipping task {task_id} with invalid time window")
+                    continue
+                if task.type not in TIMED_EXCLUDED_TYPES:
+                    timed.append((start, end, task_id))
+            elif task.type not in UNTIMED_EXCLUDED_TYPES:
+                untimed.append(task_id)
+
+        timed.sort(key=lambda window: window[0])
+        build = (time(), by_id, by_type, untimed, grouped, youtube, timed, [start for start, _, _ in timed])
+        self._builds.pop(version, None)
+        self._builds[version] = build
+        while len(self._builds) > self.keep:
+            del self._builds[next(iter(self._builds))]
+        self._load(version, build)
+
+    def _load(self, version: int, build: tuple) -> None:
+        (self.built_at, self.by_id, self.by_type, self.untimed, self.grouped, self.youtube,
+         self._timed, self._timed_starts) = build
+        self.version = version
+
+    def eligible(self, overlay: dict, now: float | None = None) -> list[Task]:
+        now = time() if now is None else now
+        task_ids = [task_id for task_id in self.untimed if overlay.get(task_id) != DONE_STATUS]
+        for start, end, task_id in self._timed[:bisect_right(self._timed_starts, now)]:
+            if now <= end and overlay.get(task_id) != DONE_STATUS:
+                task_ids.append(task_id)
+        task_ids += [task_id for task_id in self.youtube if overlay.get(task_id) != DONE_STATUS]
+        # Grouped tasks were always collected regardless of status
+        task_ids += self.grouped
+
+        return [self.by_id[task_id] for task_id in dict.fromkeys(task_ids) if task_id in overlay]
+
+
+task_catalog = TaskCatalog(ttl=settings.TASK_CATALOG_TTL)
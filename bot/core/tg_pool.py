@@ -0,0 +1,217 @@
+import asyncio
+from contextlib import asynccontextmanager
+from time import time, monotonic
+from typing import Awaitable, Callable
+
+from bot.config import settings
+from bot.exceptions import InvalidSession, TelegramFloodWait
+from bot.utils import logger
+from .background import BackgroundTask
+from .metrics import track_telegram, TELEGRAM_FLOOD_HELD
+
+
+def to_pyrogram_proxy(proxy: str | None) -> dict | None:
+    if not proxy:
+        return None
+
+    from better_proxy import Proxy
+
+    proxy = Proxy.from_str(proxy)
+    return dict(
+        scheme=proxy.protocol,
+        hostname=proxy.host,
+        port=proxy.port,
+        username=proxy.login,
+        password=proxy.password
+    )
+
+
+class LazyClient:
+    """A session's pyrogram `Client`, built the first time it is borrowed.
+
+    Importing pyrogram and building a client per session is most of the startup
+    time with many sessions, and most accounts don't need Telegram until their
+    cached login expires. The client is dropped again when it is disconnected,
+    so idle sessions hold no pyrogram state (its session file is only open while
+    connected).
+    """
+
+    __slots__ = ('name', 'kwargs', 'client')
+
+    def __init__(self, name: str, **kwargs):
+        self.name = name
+        self.kwargs = kwargs
+        self.client = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self.client is not None and bool(self.client.is_connected)
+
+    def build(self):
+        if self.client is None:
+            from pyrogram import Client
+
+            self.client = Client(name=self.name, **self.kwargs)
+        return self.client
+
+    def release(self) -> None:
+        self.client = None
+
+
+class TelegramClientManager(BackgroundTask):
+    """Lends connected pyrogram clients.
+
+    At most `max_handshakes` connects (MTProto key exchange) run at once, and a client
+    stays connected for `idle_timeout` seconds after its last use so back-to-back calls
+    don't reconnect.
+    """
+
+    def __init__(self, max_handshakes: int = 5, idle_timeout: int = 60):
+        self.idle_timeout = idle_timeout
+        self._handshakes = asyncio.Semaphore(max_handshakes)
+        self._clients = {}
+        self._locks = {}
+        self._borrowers = {}
+        self._last_used = {}
+
+    async def _connect(self, client, proxy: str | None) -> None:
+        from pyrogram.errors import Unauthorized, UserDeactivated, AuthKeyUnregistered
+
+        client.proxy = to_pyrogram_proxy(proxy)
+        async with self._handshakes:
+            try:
+                with track_telegram('connect'):
+                    await client.connect()
+            except (Unauthorized, UserDeactivated, AuthKeyUnregistered):
+                raise InvalidSession(client.name)
+
+    @asynccontextmanager
+    async def borrow(self, client, proxy: str | None = None):
+        name = client.name
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            previous = self._clients.get(name)
+            if previous is not None and previous is not client and not self._borrowers.get(name):
+                # The session was removed and added again, its old client still holds the session file
+                await self._disconnect(name)
+            if not client.is_connected:
+                await self._connect(client.build() if isinstance(client, LazyClient) else client, proxy)
+            self._clients[name] = client
+            self._borrowers[name] = self._borrowers.get(name, 0) + 1
+
+        try:
+            yield client.client if isinstance(client, LazyClient) else client
+        finally:
+            self._borrowers[name] -= 1
+            self._last_used[name] = time()
+
+    async def _disconnect(self, name: str) -> None:
+        client = self._clients.pop(name, None)
+        self._borrowers.pop(name, None)
+        self._last_used.pop(name, None)
+        if client is not None and client.is_connected:
+            try:
+                await (client.client if isinstance(client, LazyClient) else client).disconnect()
+            except Exception as error:
+                logger.warning(f"{name} | Error while disconnecting Telegram client: {error}")
+        if isinstance(client, LazyClient):
+            client.release()
+
+    async def evict_idle(self) -> None:
+        deadline = time() - self.idle_timeout
+        for name in list(self._clients):
+            if self._borrowers.get(name, 0) == 0 and self._last_used.get(name, 0) < deadline:
+                async with self._locks[name]:
+                    if self._borrowers.get(name, 0) == 0:
+                        await self._disconnect(name)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(max(1, self.idle_timeout / 4))
+            await self.evict_idle()
+
+    async def close(self) -> None:
+        self.stop()
+        for name in list(self._clients):
+            await self._disconnect(name)
+
+
+class FloodControl:
+    """Process-wide FloodWait penalties for Telegram calls.
+
+    A FloodWait is recorded per API_ID, DC and method, and every session's next call
+    of that method waits until it expires. A penalty longer than `max_wait` is not
+    waited out, the call raises `TelegramFloodWait` so the scheduler moves the account
+    to the expiry and its slot goes to accounts that don't need Telegram. After a
+    penalty one call goes first, the others follow once it got through instead of
+    all of them running into the next FloodWait.
+    """
+
+    def __init__(self, max_wait: float = 30, margin: float = 10, attempts: int = 3):
+        self.max_wait = max_wait
+        self.margin = margin
+        self.attempts = attempts
+        self._until = {}
+        self._cautious = set()
+        self._probes = {}
+
+    @staticmethod
+    def key(client, method: str) -> tuple:
+        return client.api_id, getattr(client.session, 'dc_id', None), method
+
+    def remaining(self, key: tuple) -> float:
+        return max(0.0, self._until.get(key, 0) - monotonic())
+
+    def penalize(self, key: tuple, seconds: float) -> None:
+        self._until[key] = max(self._until.get(key, 0), monotonic() + seconds + self.margin)
+        self._cautious.add(key)
+
+    async def _acquire(self, key: tuple) -> bool:
+        """Waits until `key` may be called, True when this call is the first one after a penalty."""
+        method = key[-1]
+        while True:
+            remaining = self.remaining(key)
+            if remaining > self.max_wait:
+                TELEGRAM_FLOOD_HELD.inc(method=method)
+                raise TelegramFloodWait(method, remaining)
+            if remaining > 0:
+                TELEGRAM_FLOOD_HELD.inc(method=method)
+                await asyncio.sleep(remaining)
+                continue
+            if key not in self._cautious:
+                return False
+            probe = self._probes.get(key)
+            if probe is None:
+                self._probes[key] = asyncio.Event()
+                return True
+            await probe.wait()
+
+    def _release(self, key: tuple, probe: bool, flooded: bool) -> None:
+        if not probe:
+            return
+        if not flooded:
+            self._cautious.discard(key)
+        self._probes.pop(key).set()
+
+    async def call(self, client, method: str, request: Callable[[], Awaitable]):
+        from pyrogram.errors import FloodWait
+
+        key = self.key(client, method)
+        for _ in range(self.attempts):
+            probe = await self._acquire(key)
+            flooded = False
+            try:
+                with track_telegram(method):
+                    return await request()
+            except FloodWait as error:
+                flooded = True
+                self.penalize(key, error.value)
+                logger.warning(f"{client.name} | FloodWait on {method} for {error.value}s, "
+                               f"holding it back for every session")
+            finally:
+                self._release(key, probe, flooded)
+        raise TelegramFloodWait(method, self.remaining(key))
+
+
+tg_manager = TelegramClientManager(max_handshakes=settings.TG_MAX_HANDSHAKES, idle_timeout=settings.TG_IDLE_TIMEOUT)
+flood_control = FloodControl(max_wait=settings.TG_FLOOD_MAX_WAIT)
@@ -0,0 +1,217 @@
+import asyncio
+import glob
+import json
+import os
+from collections import deque
+from functools import wraps
+from time import time, perf_counter
+from typing import Callable
+
+import aiohttp
+
+from bot.config import settings
+from bot.utils import logger
+from bot.utils.fast_json import decode, DECODE_ERRORS
+from .background import BackgroundTask
+from .retry import classify_exception, NETWORK, TIMEOUT
+
+SCRUBBED = '***'
+# JSON keys whose values never go into a recording: logins and the proxy's public IP (httpbin)
+SECRET_KEYS = {'access_token', 'token', 'init_data', 'origin'}
+# init_data parts that identify the Telegram user, auth_date is kept for the login's expiry
+SECRET_INIT_DATA_PARTS = {'user', 'hash', 'chat_instance', 'query_id', 'signature'}
+RECORDED_HEADERS = ('Retry-After',)
+
+
+def scrub_init_data(init_data: str) -> str:
+    parts = []
+    for part in init_data.split('&'):
+        key, _, _ = part.partition('=')
+        parts.append(f"{key}={SCRUBBED}" if key in SECRET_INIT_DATA_PARTS else part)
+    return '&'.join(parts)
+
+
+def scrub(value):
+    if isinstance(value, dict):
+        return {key: SCRUBBED if key in SECRET_KEYS and item else scrub(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [scrub(item) for item in value]
+    return value
+
+
+def scrub_body(body: bytes) -> str:
+    try:
+        data = decode(body)
+    except DECODE_ERRORS:
+        return body.decode(errors='replace')
+    return body.decode(errors='replace') if data is None else json.dumps(scrub(data), separators=(',', ':'))
+
+
+class Traffic(BackgroundTask):
+    """Records API exchanges and Telegram logins to JSON lines, or serves them back.
+
+    In record mode every `send` and Telegram web app login is appended to
+    `record_path` with its timing, after secrets are scrubbed. Worker processes each
+    write a shard (`traffic.<n>.jsonl`), replay reads them all. In replay mode the recordings
+    become the transport: each session gets its own recorded responses back in
+    order, without delay, and its last response per endpoint is repeated once
+    the recording runs out. Nothing touches the network.
+    """
+
+    def __init__(self, record_path: str = '', replay_path: str = '', flush_interval: int = 5):
+        self.record_path = record_path
+        self.replay_path = replay_path
+        self.flush_interval = flush_interval
+        self._file = None
+        self._exchanges = None
+        self._web_data = None
+
+    @property
+    def recording(self) -> bool:
+        return bool(self.record_path)
+
+    @property
+    def replaying(self) -> bool:
+        return bool(self.replay_path)
+
+    def use_shard(self, index: int) -> None:
+        if self.record_path:
+            root, ext = os.path.splitext(self.record_path)
+            self.record_path = f"{root}.{index}{ext}"
+
+    def _write(self, entry: dict) -> None:
+        if self._file is None:
+            self._file = open(self.record_path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    def record_exchange(self, session_name: str, method: str, endpoint: str, request: dict | None,
+                        status: int | None, headers, body: bytes | None, elapsed: float, error: str | None = None) -> None:
+        entry = {'type': 'http', 'session': session_name, 'at': round(time(), 3), 'elapsed': round(elapsed, 4),
+                 'method': method, 'endpoint': endpoint}
+        if request is not None:
+            entry['request'] = scrub(request)
+        if error is not None:
+            entry['error'] = error
+        else:
+            entry['status'] = status
+            entry['headers'] = {name: headers[name] for name in RECORDED_HEADERS if name in headers}
+            entry['body'] = scrub_body(body)
+        self._write(entry)
+
+    def record_web_data(self, session_name: str, ref_id: str, init_data: str, elapsed: float) -> None:
+        self._write({'type': 'telegram', 'session': session_name, 'at': round(time(), 3), 'elapsed': round(elapsed, 4),
+                     'ref_id': ref_id, 'init_data': scrub_init_data(init_data)})
+
+    def load(self) -> None:
+        root, ext = os.path.splitext(self.replay_path)
+        paths = [self.replay_path] + sorted(glob.glob(f"{glob.escape(root)}.*{ext}"))
+        entries = []
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding='utf-8') as recording:
+                entries.extend(json.loads(line) for line in recording if line.strip())
+        if not entries:
+            raise FileNotFoundError(f"No recordings found at {self.replay_path}")
+        # Shards from several workers interleave, replay each session in the order it was recorded
+        entries.sort(key=lambda entry: entry['at'])
+
+        self._exchanges, self._web_data = {}, {}
+        for entry in entries:
+            if entry['type'] == 'http':
+                self._exchanges.setdefault((entry['session'], entry['method'], entry['endpoint']), deque()).append(entry)
+            else:
+                self._web_data.setdefault(entry['session'], deque()).append(entry)
+        logger.info(f"Replaying {len(entries)} recorded exchanges of {len({entry['session'] for entry in entries})} sessions")
+
+    @property
+    def sessions(self) -> list[str]:
+        if self._exchanges is None:
+            self.load()
+        return sorted({session for session, _, _ in self._exchanges} | set(self._web_data))
+
+    @staticmethod
+    def _next(recorded: deque | None):
+        if not recorded:
+            return None
+        return recorded.popleft() if len(recorded) > 1 else recorded[0]
+
+    def replay_exchange(self, session_name: str, method: str, endpoint: str) -> tuple[int, dict, bytes]:
+        if self._exchanges is None:
+            self.load()
+        entry = self._next(self._exchanges.get((session_name, method, endpoint)))
+        if entry is None:
+            return 404, {}, b''
+        if 'error' in entry:
+            if entry['error'] == TIMEOUT:
+                raise asyncio.TimeoutError()
+            raise aiohttp.ClientConnectionError(f"replayed {entry['error']}")
+        return entry['status'], entry['headers'], entry['body'].encode()
+
+    def replay_web_data(self, session_name: str) -> tuple[str | None, str | None]:
+        if self._web_data is None:
+            self.load()
+        entry = self._next(self._web_data.get(session_name))
+        if entry is None:
+            return None, None
+        return entry['ref_id'], entry['init_data']
+
+    async def send(self, session_name: str, http_client, method: str, url: str, endpoint: str,
+                   **kwargs) -> tuple[int, object, bytes]:
+        """The transport under `Tapper`: one HTTP exchange as (status, headers, body)."""
+        if self.replaying:
+            return self.replay_exchange(session_name, method, endpoint)
+
+        if not self.recording:
+            response = await http_client.request(method, url, **kwargs)
+            return response.status, response.headers, await response.read()
+
+        start = perf_counter()
+        try:
+            response = await http_client.request(method, url, **kwargs)
+            body = await response.read()
+        except Exception as error:
+            request_error = classify_exception(endpoint, error)
+            kind = request_error.kind if request_error else NETWORK
+            self.record_exchange(session_name, method, endpoint, kwargs.get('json'), None, None, None,
+                                 perf_counter() - start, error=kind)
+            raise
+        self.record_exchange(session_name, method, endpoint, kwargs.get('json'), response.status, response.headers,
+                             body, perf_counter() - start)
+        return response.status, response.headers, body
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    def start(self) -> None:
+        if self.recording:
+            super().start()
+
+    def close(self) -> None:
+        self.stop()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def recorded_web_data(func: Callable):
+    """Serves `get_tg_web_data` from the recording when replaying, records its result when recording."""
+    @wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        if traffic.replaying:
+            return traffic.replay_web_data(self.session_name)
+        start = perf_counter()
+        ref_id, init_data = await func(self, *args, **kwargs)
+        if traffic.recording and init_data:
+            traffic.record_web_data(self.session_name, ref_id, init_data, perf_counter() - start)
+        return ref_id, init_data
+    return wrapper
+
+
+traffic = Traffic(record_path=settings.RECORD_TRAFFIC, replay_path=settings.REPLAY_TRAFFIC)
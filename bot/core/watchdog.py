@@ -0,0 +1,75 @@
+import asyncio
+import sys
+import threading
+import traceback
+from time import monotonic
+
+from bot.config import settings
+from bot.utils import logger
+from .background import BackgroundTask
+from .metrics import LOOP_LAG, LOOP_LAG_CURRENT, LOOP_STALLS
+
+
+class LoopWatchdog(BackgroundTask):
+    """Measures event loop scheduling delay and reports what blocks the loop.
+
+    A heartbeat coroutine wakes every `interval` seconds and records how late it woke.
+    A monitor thread watches the heartbeat, when it is `threshold` seconds overdue the
+    loop is stuck in synchronous code and the thread logs the loop thread's stack.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.5, stack_limit: int = 20):
+        self.interval = interval
+        self.threshold = threshold
+        self.stack_limit = stack_limit
+        self.max_lag = 0.0
+        self._beat = monotonic()
+        self._loop_thread_id = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._beat = monotonic()
+            LOOP_LAG.observe(lag)
+            LOOP_LAG_CURRENT.set(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                logger.warning(f"Event loop was blocked for <light-red>{lag:.3f}s</light-red>")
+
+    def _monitor(self) -> None:
+        reported = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            if monotonic() - beat < self.threshold or reported == beat:
+                continue
+            # One report per stall, the heartbeat logs its full length once the loop is free
+            reported = beat
+            LOOP_STALLS.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = ''.join(traceback.format_stack(frame, limit=self.stack_limit)).rstrip()
+            # Stacks contain <module> and the like, which the colored logger would read as markup
+            logger.opt(colors=False).warning(f"Event loop blocked for more than {self.threshold}s, it is running:\n{stack}")
+
+    def start(self) -> None:
+        if self.threshold <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = monotonic()
+        self._stop.clear()
+        super().start()
+        self._thread = threading.Thread(target=self._monitor, name='loop-watchdog', daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self.stop()
+        self._stop.set()
+
+
+loop_watchdog = LoopWatchdog(threshold=settings.LOOP_LAG_THRESHOLD)
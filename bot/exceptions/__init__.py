@@ -1,2 +1,30 @@
 class InvalidSession(BaseException):
     ...
+
+
+class RequestError(Exception):
+    """An API request failed, `kind` is its class in `bot.core.retry` (network, timeout, server, ...).
+
+    `retry_after` is the server's (or circuit breaker's) hint in seconds, `sent` is False when
+    the request never reached the server and is safe to repeat even for writes.
+    """
+
+    def __init__(self, endpoint: str | None, kind: str, message: str = '', retry_after: float | None = None,
+                 sent: bool = True):
+        super().__init__(f"{endpoint} | {kind}{f': {message}' if message else ''}")
+        self.endpoint = endpoint
+        self.kind = kind
+        self.retry_after = retry_after
+        self.sent = sent
+
+
+class CircuitOpen(RequestError):
+    def __init__(self, endpoint: str | None, retry_after: float):
+        super().__init__(endpoint, 'circuit_open', f"retry in {round(retry_after)}s", retry_after=retry_after, sent=False)
+
+
+class TelegramFloodWait(RequestError):
+    """A Telegram method is under a FloodWait longer than a call should wait for, `endpoint` is the method."""
+
+    def __init__(self, method: str, retry_after: float):
+        super().__init__(method, 'flood_wait', f"retry in {round(retry_after)}s", retry_after=retry_after, sent=False)
@@ -0,0 +1,27 @@
+import json
+
+# Optional fast decoders, both parse bytes directly without decoding to str first
+try:
+    import orjson
+
+    loads = orjson.loads
+    DECODE_ERRORS = (orjson.JSONDecodeError,)
+    JSON_BACKEND = 'orjson'
+except ImportError:
+    try:
+        import msgspec
+
+        loads = msgspec.json.Decoder().decode
+        DECODE_ERRORS = (msgspec.DecodeError, UnicodeDecodeError)
+        JSON_BACKEND = 'msgspec'
+    except ImportError:
+        loads = json.loads
+        DECODE_ERRORS = (ValueError,)
+        JSON_BACKEND = 'json'
+
+
+def decode(body: bytes):
+    """Decode a response body, an empty body is None like `ClientResponse.json()`."""
+    if not body or not body.strip():
+        return None
+    return loads(body)
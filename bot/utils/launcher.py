@@ -1,17 +1,22 @@
-import os
-import glob
 import asyncio
 import argparse
-from itertools import cycle
 import sys
-
-from pyrogram import Client
-from better_proxy import Proxy
+from time import time
 
 from bot.config import settings
-from bot.core.api_check import check_base_url,get_version_info,get_local_version_info
+from bot.core.api_check import api_checker,get_version_info,get_local_version_info
 from bot.utils import logger
-from bot.core.tapper import run_tapper
+from bot.core.tapper import Tapper
+from bot.core.scheduler import Scheduler
+from bot.core.http_pool import session_pool
+from bot.core.auth_cache import auth_cache
+from bot.core.tg_pool import tg_manager, LazyClient
+from bot.core.state_store import state_store
+from bot.core import metrics
+from bot.core.watchdog import loop_watchdog
+from bot.core.traffic import traffic
+from bot.core.accounts import accounts
+from bot.utils.workers import run_workers
 from bot.core.registrator import register_sessions
 
 
@@ -24,29 +29,11 @@ Select an action:
 
 global tg_clients
 
-def get_session_names() -> list[str]:
-    session_names = glob.glob("sessions/*.session")
-    session_names = [
-        os.path.splitext(os.path.basename(file))[0] for file in session_names
-    ]
-
-    return session_names
-
-
-def get_proxies() -> list[Proxy]:
-    if settings.USE_PROXY_FROM_FILE:
-        with open(file="bot/config/proxies.txt", encoding="utf-8-sig") as file:
-            proxies = [Proxy.from_str(proxy=row.strip()).as_url for row in file]
-    else:
-        proxies = []
-
-    return proxies
-
-
-async def get_tg_clients() -> list[Client]:
+async def get_tg_clients() -> list[LazyClient]:
     global tg_clients
 
-    session_names = get_session_names()
+    accounts.refresh()
+    session_names = list(accounts.accounts)
 
     if not session_names:
         raise FileNotFoundError("Not found session files")
@@ -54,30 +41,45 @@ async def get_tg_clients() -> list[Client]:
     if not settings.API_ID or not settings.API_HASH:
         raise ValueError("API_ID and API_HASH not found in the .env file.")
 
-    tg_clients = [
-        Client(
+    tg_clients = build_tg_clients(session_names)
+
+    return tg_clients
+
+
+def build_tg_clients(session_names: list[str]) -> list[LazyClient]:
+    # Only names and arguments here, pyrogram clients are built when a session first needs Telegram
+    return [
+        LazyClient(
             name=session_name,
             api_id=settings.API_ID,
             api_hash=settings.API_HASH,
             workdir="sessions/",
-            plugins=dict(root="bot/plugins"),
+            # Clients only request a web view and update the profile: no updates pushed by
+            # the server, no handler threads and no plugins to scan
+            no_updates=True,
+            workers=1,
         )
         for session_name in session_names
     ]
 
-    return tg_clients
-
 
 async def process() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("-a", "--action", type=int, help="Action to perform")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this local port")
+    parser.add_argument("--workers", type=int, default=1, help="Split sessions across this many processes")
+    parser.add_argument("--uvloop", action="store_true", help="Run worker event loops on uvloop")
     
-    if check_base_url() is False:
+    # Both checks only talk to the network, run them side by side and don't let a slow host hold up the start
+    api_verdict, (github_version, message) = await asyncio.gather(
+        api_checker.check(timeout=settings.STARTUP_CHECK_TIMEOUT),
+        get_version_info(timeout=settings.STARTUP_CHECK_TIMEOUT)
+    )
+    if api_verdict is False:
         sys.exit(
             "Detected api change! Stopped the bot for safety.Please raise an issue on the GitHub repository.")
-    else:
+    elif api_verdict:
         logger.info("<cyan>No change in API!</cyan>")
-    github_version,message = get_version_info()
     local_version = get_local_version_info()
         
     if github_version is not None and local_version is not None and message is not None:
@@ -87,9 +89,11 @@ async def process() -> None:
             logger.info(f"<cyan>Bot is out of date, update the bot with command 'git pull', </cyan><light-red>v{local_version}</light-red> <cyan>> </cyan><light-red>v{github_version}</light-red>")
         logger.info(f"<cyan>Developer message:{message}</cyan>")
 
-    logger.info(f"Detected {len(get_session_names())} sessions | {len(get_proxies())} proxies")
+    accounts.refresh()
+    logger.info(f"Detected {len(accounts)} sessions | {len(accounts.proxies())} proxies")
 
-    action = parser.parse_args().action
+    args = parser.parse_args()
+    action = args.action
 
     if not action:
         print(start_text)
@@ -108,22 +112,91 @@ async def process() -> None:
     if action == 2:
         await register_sessions()
     elif action == 1:
-        tg_clients = await get_tg_clients()
-
-        await run_tasks(tg_clients=tg_clients)
+        if args.workers > 1:
+            api_checker.start()
+            accounts.refresh()
+            if not len(accounts):
+                raise FileNotFoundError("Not found session files")
+            # Workers build their own registry, the proxy bindings it starts from are saved by now
+            state_store.close()
+            await run_workers(accounts.proxy_bindings(), args.workers,
+                              use_uvloop=args.uvloop, metrics_port=args.metrics_port)
+            return
 
-
-async def run_tasks(tg_clients: list[Client]):
-    proxies = get_proxies()
-    proxies_cycle = cycle(proxies) if proxies else None
-    tasks = [
-        asyncio.create_task(
-            run_tapper(
-                tg_client=tg_client,
-                proxy=next(proxies_cycle) if proxies_cycle else None,
-            )
-        )
-        for tg_client in tg_clients
-    ]
-
-    await asyncio.gather(*tasks)
+        tg_clients = await get_tg_clients()
+        api_checker.start()
+
+        metrics_runner = await metrics.start_server(args.metrics_port) if args.metrics_port else None
+        try:
+            await run_tasks(tg_clients=tg_clients)
+        finally:
+            if metrics_runner:
+                await metrics_runner.cleanup()
+
+
+def schedule(scheduler: Scheduler, tapper: Tapper, state: dict | None) -> None:
+    start_time = time() + tapper.start_delay()
+    if state:
+        # Resume from what is actually due instead of running a full cycle on every restart
+        tapper.restore_state(state)
+        start_time = max(start_time, tapper.next_due(min_delay=0))
+    scheduler.add(tapper.session_name, tapper.run_cycle, due=start_time)
+    scheduler.add(f"{tapper.session_name}:auth", tapper.refresh_auth,
+                  due=max(tapper.token_expiration - settings.AUTH_REFRESH_MARGIN, start_time + 60))
+
+
+def unschedule(scheduler: Scheduler, session_name: str) -> None:
+    # A cycle that is running finishes and saves its state, the account is not scheduled again
+    scheduler.remove(session_name)
+    scheduler.remove(f"{session_name}:auth")
+    metrics.ACCOUNT_CYCLE_DURATION.remove(session=session_name)
+    metrics.ACCOUNT_NEXT_DUE.remove(session=session_name)
+
+
+async def run_tasks(tg_clients: list[LazyClient]):
+    scheduler = Scheduler(workers=settings.MAX_ACTIVE_SESSIONS)
+    states = state_store.load_all()
+    tappers = {}
+
+    for tg_client in tg_clients:
+        account = accounts.get(tg_client.name)
+        tapper = tappers[tg_client.name] = Tapper(tg_client=tg_client, proxy=account.proxy if account else None)
+        schedule(scheduler, tapper, states.get(tapper.session_name))
+
+    async def apply() -> None:
+        for session_name in tappers.keys() - accounts.accounts.keys():
+            unschedule(scheduler, session_name)
+            del tappers[session_name]
+            logger.info(f"{session_name} | Session removed, stopping after its current cycle")
+
+        added = [session_name for session_name in accounts.accounts if session_name not in tappers]
+        auth_cache.adopt(added)
+        for tg_client in build_tg_clients(added):
+            tapper = tappers[tg_client.name] = Tapper(tg_client=tg_client, proxy=accounts.get(tg_client.name).proxy)
+            schedule(scheduler, tapper, state_store.load(tapper.session_name))
+            logger.info(f"{tapper.session_name} | Session added | Proxy: {tapper.proxy_label}")
+
+        for session_name, account in accounts.accounts.items():
+            tapper = tappers[session_name]
+            if tapper.proxy != account.proxy:
+                tapper.set_proxy(account.proxy)
+                logger.info(f"{session_name} | Proxy changed to {tapper.proxy_label}")
+
+    watch = asyncio.create_task(accounts.run(settings.SESSION_WATCH_INTERVAL, apply)) if settings.SESSION_WATCH_INTERVAL > 0 else None
+
+    session_pool.start()
+    auth_cache.start()
+    tg_manager.start()
+    loop_watchdog.start()
+    traffic.start()
+    try:
+        await scheduler.run()
+    finally:
+        if watch:
+            watch.cancel()
+        traffic.close()
+        loop_watchdog.close()
+        await tg_manager.close()
+        await auth_cache.close()
+        await session_pool.close()
+        state_store.close()
@@ -1,10 +1,212 @@
+import functools
+import json
+import queue
+import re
 import sys
+import threading
+from typing import Callable
+
 from loguru import logger
 
+from bot.config import settings
+
+LOG_FORMAT = ("<white>{time:YYYY-MM-DD HH:mm:ss}</white>"
+              " | <level>{level: <8}</level>"
+              " | <cyan><b>{line}</b></cyan>"
+              " - <white><b>{message}</b></white>")
+
+# Log lines start with "<session name> | " (scheduler keys add ":auth")
+_session_prefix = re.compile(r'^([^\s|:]+)(?::\S+)? \| ')
+_markup = re.compile(r'</?[a-z][a-z_-]*>')
+_numbers = re.compile(r'\d+(?:\.\d+)?')
+
+
+def patch_record(record: dict) -> None:
+    """Adds `session_name` and `event` (the message with names and numbers taken out) to `extra`."""
+    extra = record['extra']
+    message = record['message']
+    prefix = _session_prefix.match(message)
+    if prefix:
+        extra.setdefault('session_name', prefix.group(1))
+        message = message[prefix.end():]
+    else:
+        extra.setdefault('session_name', None)
+    extra.setdefault('event', _numbers.sub('#', _markup.sub('', message)).strip())
+
+
+class RepeatCollapser:
+    """Lets the first of a repeated message through and summarizes the rest.
+
+    Messages are the same when their level and `event` match, whichever account
+    logged them. Every `interval` seconds a summary line per collapsed event says
+    how often it was held back and for how many accounts.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._repeats = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __call__(self, record: dict) -> bool:
+        extra = record['extra']
+        if extra.get('summary'):
+            return True
+        key = (record['level'].name, extra['event'])
+        with self._lock:
+            if key not in self._seen:
+                self._seen.add(key)
+                return True
+            count, sessions = self._repeats.get(key, (0, set()))
+            if extra['session_name']:
+                sessions.add(extra['session_name'])
+            self._repeats[key] = (count + 1, sessions)
+        return False
+
+    def flush(self) -> None:
+        with self._lock:
+            repeats, self._repeats = self._repeats, {}
+            self._seen.clear()
+        for (level, event), (count, sessions) in repeats.items():
+            logger.bind(summary=True, event=event, session_name=None).opt(colors=False).log(
+                level, f"{event} | repeated {count} more times for {len(sessions)} accounts in {self.interval}s")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='log-collapser', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+class QueueSink:
+    """Hands log lines to a writer thread, so the event loop never waits on the terminal.
+
+    With `serialize` the writer also turns each record into a JSON line. Everything
+    queued is written in one go, and `stop` (called by loguru on removal and at exit)
+    drains the queue first.
+    """
+
+    def __init__(self, stream, serialize: bool = False, fields: dict | None = None, batch_size: int = 1000):
+        self.stream = stream
+        self.serialize = serialize
+        self.fields = fields or {}
+        self.batch_size = batch_size
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def write(self, message) -> None:
+        self._queue.put(message)
+
+    def render(self, message) -> str:
+        if not self.serialize:
+            return message
+        return to_json(message, self.fields)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            lines = []
+            message = self._queue.get()
+            while message is not None:
+                lines.append(self.render(message))
+                if len(lines) >= self.batch_size:
+                    break
+                try:
+                    message = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            stopping = message is None
+            if lines:
+                self.stream.write(''.join(lines))
+                self.stream.flush()
+
+    def stop(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+def to_json(message, fields: dict | None = None) -> str:
+    record = message.record
+    extra = record['extra']
+    return json.dumps({
+        'time': record['time'].isoformat(),
+        'level': record['level'].name,
+        'session_name': extra.get('session_name'),
+        'event': extra.get('event'),
+        'message': str(message).rstrip('\n'),
+        'module': record['name'],
+        'line': record['line'],
+        **(fields or {}),
+    }, ensure_ascii=False) + '\n'
+
+
+def level_filter(default: str, levels: dict[str, str]) -> Callable[[dict], bool]:
+    default_no = logger.level(default.upper()).no
+    levels_no = {session_name: logger.level(level.upper()).no for session_name, level in levels.items()}
+
+    def accept(record: dict) -> bool:
+        return record['level'].no >= levels_no.get(record['extra']['session_name'], default_no)
+
+    return accept
+
+
+_collapser = None
+
+
+def setup_logging(stream=sys.stdout, colorize: bool | None = None, worker: int | None = None) -> None:
+    """(Re)configures the one sink everything is logged to, worker processes pass their queue writer."""
+    global _collapser
+
+    logger.remove()
+    logger.configure(patcher=patch_record)
+    if _collapser is not None:
+        _collapser.stop()
+        _collapser = None
+
+    accept = level_filter(settings.LOG_LEVEL, settings.LOG_LEVELS)
+    if settings.LOG_COLLAPSE_INTERVAL > 0:
+        _collapser = RepeatCollapser(settings.LOG_COLLAPSE_INTERVAL)
+        _collapser.start()
+        collapse = _collapser
+        log_filter = lambda record: accept(record) and collapse(record)
+    else:
+        log_filter = accept
+
+    if colorize is None:
+        colorize = stream.isatty()
+    if settings.LOG_JSON:
+        fields = {'worker': worker} if worker is not None else {}
+        if settings.LOG_ASYNC:
+            sink = QueueSink(stream, serialize=True, fields=fields)
+        else:
+            def sink(message):
+                stream.write(to_json(message, fields))
+                stream.flush()
+        log_format, colorize = "{message}", False
+    else:
+        log_format = LOG_FORMAT if worker is None else f"<magenta>w{worker}</magenta> | {LOG_FORMAT}"
+        sink = QueueSink(stream) if settings.LOG_ASYNC else stream
+
+    logger.add(sink=sink, format=log_format, colorize=colorize, level=0, filter=log_filter)
+
+
+def session_logging(func: Callable):
+    """Binds `session_name` for everything an account method logs, including the tasks it starts."""
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        with logger.contextualize(session_name=self.session_name):
+            return await func(self, *args, **kwargs)
+    return wrapper
+
 
-logger.remove()
-logger.add(sink=sys.stdout, format="<white>{time:YYYY-MM-DD HH:mm:ss}</white>"
-                                   " | <level>{level: <8}</level>"
-                                   " | <cyan><b>{line}</b></cyan>"
-                                   " - <white><b>{message}</b></white>")
+setup_logging()
 logger = logger.opt(colors=True)
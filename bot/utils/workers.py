@@ -0,0 +1,199 @@
+import asyncio
+import multiprocessing
+import signal
+import sys
+import threading
+import zlib
+from contextlib import suppress
+from time import monotonic
+
+from bot.config import settings
+from bot.core import metrics
+from bot.core.api_check import api_checker
+from bot.utils.logger import logger, setup_logging
+
+METRICS_PUSH_INTERVAL = 5
+
+
+def shard_of(session_name: str, workers: int) -> int:
+    # crc32 rather than hash(), which is salted per process, so sessions keep their worker across restarts
+    return zlib.crc32(session_name.encode()) % workers
+
+
+def partition(assignments: dict[str, str | None], workers: int) -> list[dict[str, str | None]]:
+    shards = [{} for _ in range(workers)]
+    for session_name, proxy in assignments.items():
+        shards[shard_of(session_name, workers)][session_name] = proxy
+    return shards
+
+
+class QueueWriter:
+    """A text stream whose writes go to the parent process, which prints them."""
+
+    def __init__(self, log_queue):
+        self.log_queue = log_queue
+
+    def write(self, text: str) -> None:
+        self.log_queue.put(str(text))
+
+    def flush(self) -> None:
+        pass
+
+
+def worker_main(index: int, workers: int, log_queue, metrics_queue, use_uvloop: bool, colorize: bool) -> None:
+    """Entry point of a worker process: runs its shard of sessions on its own event loop."""
+    setup_logging(stream=QueueWriter(log_queue), colorize=colorize, worker=index)
+
+    if use_uvloop:
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        except ImportError:
+            logger.warning("uvloop is not installed, using the default event loop")
+
+    try:
+        asyncio.run(run_worker(index, workers, metrics_queue))
+    except KeyboardInterrupt:
+        pass
+
+
+async def run_worker(index: int, workers: int, metrics_queue) -> None:
+    # Imported here, the launcher imports this module
+    from bot.core.accounts import accounts
+    from bot.core.auth_cache import auth_cache
+    from bot.core.traffic import traffic
+    from bot.utils.launcher import build_tg_clients, run_tasks
+
+    # The worker's own registry, with the sessions that hash to it, also those added while running
+    accounts.owns = lambda session_name: shard_of(session_name, workers) == index
+    accounts.refresh()
+    auth_cache.use_shard(index, accounts.accounts)
+    traffic.use_shard(index)
+    publisher = asyncio.create_task(publish_metrics(index, metrics_queue))
+    try:
+        await run_tasks(build_tg_clients(list(accounts.accounts)))
+    finally:
+        publisher.cancel()
+
+
+async def publish_metrics(index: int, metrics_queue) -> None:
+    while True:
+        await asyncio.sleep(METRICS_PUSH_INTERVAL)
+        metrics_queue.put((index, metrics.registry.snapshot()))
+
+
+class WorkerPool:
+    """Runs shards of the sessions in worker processes and restarts the ones that die.
+
+    Workers send their log lines and metric snapshots back over queues, the parent
+    prints the logs and serves every worker's metrics from one endpoint. A worker that
+    keeps crashing is restarted with a growing delay.
+    """
+
+    def __init__(self, shards: list[dict[str, str | None]], use_uvloop: bool = False,
+                 restart_delay: float = 5, max_restart_delay: float = 300, stable_uptime: float = 600):
+        self.shards = shards
+        self.use_uvloop = use_uvloop
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stable_uptime = stable_uptime
+        self._context = multiprocessing.get_context('spawn')
+        self.log_queue = self._context.Queue()
+        self.metrics_queue = self._context.Queue()
+        self.processes = {}
+        self.snapshots = {}
+        self._started_at = {}
+        self._crashes = {}
+        self._restart_at = {}
+        self._threads = []
+
+    def _spawn(self, index: int) -> None:
+        process = self._context.Process(
+            target=worker_main,
+            name=f"tomarket-worker-{index}",
+            args=(index, len(self.shards), self.log_queue, self.metrics_queue, self.use_uvloop, sys.stdout.isatty()),
+            daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+        self._started_at[index] = monotonic()
+        logger.info(f"Worker {index} started (pid {process.pid}) with {len(self.shards[index])} sessions")
+
+    def _forward_logs(self) -> None:
+        while (message := self.log_queue.get()) is not None:
+            sys.stdout.write(message)
+            sys.stdout.flush()
+
+    def _collect_metrics(self) -> None:
+        while (item := self.metrics_queue.get()) is not None:
+            index, snapshot = item
+            self.snapshots[index] = snapshot
+
+    def render_metrics(self) -> str:
+        return metrics.registry.render_workers(self.snapshots)
+
+    def _check_workers(self) -> None:
+        now = monotonic()
+        for index, process in self.processes.items():
+            if process.is_alive() or index in self._restart_at:
+                continue
+            # A worker that ran for a while before dying starts over from the base delay
+            crashes = 0 if now - self._started_at[index] > self.stable_uptime else self._crashes.get(index, 0)
+            self._crashes[index] = crashes + 1
+            delay = min(self.max_restart_delay, self.restart_delay * 2 ** crashes)
+            logger.warning(f"Worker {index} exited with code {process.exitcode}, restarting in <light-red>{delay}s</light-red>")
+            self._restart_at[index] = now + delay
+
+        for index, restart_at in list(self._restart_at.items()):
+            if now >= restart_at:
+                del self._restart_at[index]
+                self._spawn(index)
+
+    async def run(self) -> None:
+        self._threads = [threading.Thread(target=self._forward_logs, name='worker-logs', daemon=True),
+                         threading.Thread(target=self._collect_metrics, name='worker-metrics', daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+        # `docker stop` sends SIGTERM, shut the workers down as on Ctrl+C (not available on Windows)
+        stopping = asyncio.Event()
+        with suppress(NotImplementedError):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+
+        for index, shard in enumerate(self.shards):
+            # A worker without sessions yet still runs when it would pick up those added to its shard
+            if shard or settings.SESSION_WATCH_INTERVAL > 0:
+                self._spawn(index)
+
+        while not stopping.is_set():
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stopping.wait(), 1)
+            if api_checker.api_changed:
+                sys.exit(
+                    "Detected api change! Stopped the bot for safety. Please raise an issue on the GitHub repository.")
+            self._check_workers()
+
+    def close(self) -> None:
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(timeout=10)
+        self.log_queue.put(None)
+        self.metrics_queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+
+async def run_workers(assignments: dict[str, str | None], workers: int, use_uvloop: bool = False,
+                      metrics_port: int | None = None) -> None:
+    shards = partition(assignments, workers)
+    logger.info(f"Splitting {len(assignments)} sessions across {workers} workers")
+    pool = WorkerPool(shards, use_uvloop=use_uvloop)
+    metrics_runner = await metrics.start_server(metrics_port, render=pool.render_metrics) if metrics_port else None
+    try:
+        await pool.run()
+    finally:
+        pool.close()
+        if metrics_runner:
+            await metrics_runner.cleanup()